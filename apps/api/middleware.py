@@ -8,6 +8,8 @@ from django.utils import timezone
 from datetime import timedelta
 import hashlib
 
+from apps.users.utils import get_client_ip
+
 
 class EnhancedRateLimitMiddleware(MiddlewareMixin):
     """
@@ -148,7 +150,7 @@ class EnhancedRateLimitMiddleware(MiddlewareMixin):
         """
         Check rate limits for anonymous users (by IP)
         """
-        client_ip = self.get_client_ip(request)
+        client_ip = get_client_ip(request)
         ip_hash = hashlib.md5(client_ip.encode()).hexdigest()
 
         # Stricter limits for anonymous users
@@ -213,15 +215,6 @@ class EnhancedRateLimitMiddleware(MiddlewareMixin):
             'retry_after': retry_after
         }, status=429)
 
-    def get_client_ip(self, request):
-        """
-        Get client IP address
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
-
 
 class BurstRateLimitMiddleware(MiddlewareMixin):
     """
@@ -244,7 +237,7 @@ class BurstRateLimitMiddleware(MiddlewareMixin):
             identifier = f"user:{request.user.id}"
             burst_limit = 10  # 10 requests per minute for users
         else:
-            client_ip = self.get_client_ip(request)
+            client_ip = get_client_ip(request)
             identifier = f"ip:{hashlib.md5(client_ip.encode()).hexdigest()}"
             burst_limit = 5  # 5 requests per minute for anonymous
 
@@ -264,15 +257,6 @@ class BurstRateLimitMiddleware(MiddlewareMixin):
 
         return None
 
-    def get_client_ip(self, request):
-        """
-        Get client IP address
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
-
 
 class AdaptiveRateLimitMiddleware(MiddlewareMixin):
     """
@@ -337,7 +321,7 @@ class GeographicRateLimitMiddleware(MiddlewareMixin):
         if not request.path.startswith('/api/'):
             return None
 
-        client_ip = self.get_client_ip(request)
+        client_ip = get_client_ip(request)
         country_code = self.get_country_code(client_ip)
 
         if country_code in self.high_risk_countries:
@@ -359,15 +343,6 @@ class GeographicRateLimitMiddleware(MiddlewareMixin):
 
         return None
 
-    def get_client_ip(self, request):
-        """
-        Get client IP address
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
-
     def get_country_code(self, ip_address):
         """
         Get country code from IP address
@@ -419,7 +394,7 @@ class RateLimitByEndpointMiddleware(MiddlewareMixin):
         elif request.user.is_authenticated:
             identifier = f"user:{request.user.id}"
         else:
-            client_ip = self.get_client_ip(request)
+            client_ip = get_client_ip(request)
             identifier = f"ip:{hashlib.md5(client_ip.encode()).hexdigest()}"
 
         # Check limits for this specific endpoint
@@ -452,12 +427,3 @@ class RateLimitByEndpointMiddleware(MiddlewareMixin):
         cache.set(daily_key, daily_count + 1, 86400)
 
         return None
-
-    def get_client_ip(self, request):
-        """
-        Get client IP address
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
@@ -1,6 +1,7 @@
 from rest_framework import permissions
 from rest_framework_api_key.permissions import BaseHasAPIKey
 from apps.teams.models import OrganizationAPIKey
+from apps.users.utils import get_client_ip
 
 
 class HasUserAPIKey(BaseHasAPIKey):
@@ -35,7 +36,7 @@ class HasUserAPIKey(BaseHasAPIKey):
             return False
 
         # Check IP restrictions
-        client_ip = self.get_client_ip(request)
+        client_ip = get_client_ip(request)
         if not api_key.is_ip_allowed(client_ip):
             return False
 
@@ -48,13 +49,6 @@ class HasUserAPIKey(BaseHasAPIKey):
 
         return True
 
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
-
 
 class IsAuthenticatedOrHasUserAPIKey(permissions.BasePermission):
     """
@@ -19,6 +19,7 @@ from apps.api.serializers import (
     ResendVerificationSerializer
 )
 from apps.users.models import UserActivity
+from apps.users.utils import get_client_ip
 
 User = get_user_model()
 
@@ -276,7 +277,7 @@ def password_reset_confirm_view(request):
 
             if default_token_generator.check_token(user, reset_token):
                 user.set_password(password)
-                user.save()
+                user.save(update_fields=['password'])
 
                 # Invalidate all existing tokens
                 Token.objects.filter(user=user).delete()
@@ -329,7 +330,7 @@ def change_password_view(request):
 
         # Set new password
         request.user.set_password(new_password)
-        request.user.save()
+        request.user.save(update_fields=['password'])
 
         # Invalidate all existing tokens except current one
         current_token = getattr(request.user, 'auth_token', None)
@@ -378,7 +379,7 @@ def verify_email_view(request):
 
             if default_token_generator.check_token(user, verify_token):
                 user.is_verified = True
-                user.save()
+                user.save(update_fields=['is_verified'])
 
                 # Log activity
                 UserActivity.objects.create(
@@ -452,16 +453,6 @@ def resend_verification_view(request):
 
 
 # Helper functions
-def get_client_ip(request):
-    """Get client IP address from request"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
-
-
 def send_verification_email(user, request):
     """Send email verification email"""
     token = default_token_generator.make_token(user)
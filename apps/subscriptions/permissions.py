@@ -152,7 +152,7 @@ class IsSubscriptionOwner(permissions.BasePermission):
         if not organization:
             return False
 
-        return organization.owner == request.user
+        return organization.owner_id == request.user.id
 
 
 class CanModifySubscriptionStatus(permissions.BasePermission):
@@ -187,16 +187,10 @@ class HasValidSubscription(permissions.BasePermission):
             return False
 
         # Check if user belongs to any organization with valid subscription
-        user_orgs = request.user.organization_memberships.filter(
-            is_active=True
-        ).select_related('organization')
-
-        for membership in user_orgs:
-            org = membership.organization
-            if hasattr(org, 'subscription') and org.subscription.is_active:
-                return True
-
-        return False
+        return request.user.organization_memberships.filter(
+            is_active=True,
+            organization__subscription__status__in=['trial', 'active']
+        ).exists()
 
 
 class CanExceedUsageLimits(permissions.BasePermission):
@@ -210,17 +204,10 @@ class CanExceedUsageLimits(permissions.BasePermission):
             return False
 
         # Check if user has any organizations with unlimited plans
-        user_orgs = request.user.organization_memberships.filter(
-            is_active=True
-        ).select_related('organization__subscription__plan')
-
-        for membership in user_orgs:
-            org = membership.organization
-            if (hasattr(org, 'subscription') and
-                    org.subscription.plan.plan_type == 'enterprise'):
-                return True
-
-        return False
+        return request.user.organization_memberships.filter(
+            is_active=True,
+            organization__subscription__plan__plan_type='enterprise'
+        ).exists()
 
 
 class CanViewInvoices(permissions.BasePermission):
@@ -275,7 +262,7 @@ class CanCreateSubscription(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         # obj would be the organization in this case
-        return obj.owner == request.user
+        return obj.owner_id == request.user.id
 
 
 class CanCancelSubscription(permissions.BasePermission):
@@ -289,7 +276,7 @@ class CanCancelSubscription(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if hasattr(obj, 'organization'):
-            return obj.organization.owner == request.user
+            return obj.organization.owner_id == request.user.id
         return False
 
 
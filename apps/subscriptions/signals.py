@@ -231,17 +231,16 @@ def create_subscription_notification(subscription, title, message):
     members_to_notify = subscription.organization.members.filter(
         is_active=True,
         role__name__in=[Role.OWNER, Role.ADMIN]
+    ).select_related('user')
+
+    UserNotification.create_notifications_bulk(
+        users=[member.user for member in members_to_notify],
+        title=title,
+        message=message,
+        notification_type='billing',
+        organization=subscription.organization
     )
 
-    for member in members_to_notify:
-        UserNotification.create_notification(
-            user=member.user,
-            title=title,
-            message=message,
-            notification_type='billing',
-            organization=subscription.organization
-        )
-
 
 # Email notification functions
 def send_subscription_welcome_email(subscription):
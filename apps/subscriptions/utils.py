@@ -377,17 +377,16 @@ class UsageTracker:
         members_to_notify = subscription.organization.members.filter(
             is_active=True,
             role__name__in=[Role.OWNER, Role.ADMIN]
+        ).select_related('user')
+
+        UserNotification.create_notifications_bulk(
+            users=[member.user for member in members_to_notify],
+            title=f"Usage Alert: {usage_type.title()}",
+            message=f"Your {usage_type.replace('_', ' ')} usage is at {percentage}% of your plan limit",
+            notification_type='warning' if percentage < 100 else 'error',
+            organization=subscription.organization
         )
 
-        for member in members_to_notify:
-            UserNotification.create_notification(
-                user=member.user,
-                title=f"Usage Alert: {usage_type.title()}",
-                message=f"Your {usage_type.replace('_', ' ')} usage is at {percentage}% of your plan limit",
-                notification_type='warning' if percentage < 100 else 'error',
-                organization=subscription.organization
-            )
-
     @staticmethod
     def get_usage_stats(subscription: OrganizationSubscription, period: str) -> Dict[str, Any]:
         """
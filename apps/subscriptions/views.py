@@ -146,9 +146,7 @@ class OrganizationSubscriptionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return subscriptions for user's organizations"""
-        user_org_ids = self.request.user.organization_memberships.filter(
-            is_active=True
-        ).values_list('organization_id', flat=True)
+        user_org_ids = self.request.user.get_organization_ids()
 
         return OrganizationSubscription.objects.filter(
             organization_id__in=user_org_ids
@@ -424,9 +422,7 @@ class SubscriptionInvoiceViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         """Return invoices for user's organization subscriptions"""
-        user_org_ids = self.request.user.organization_memberships.filter(
-            is_active=True
-        ).values_list('organization_id', flat=True)
+        user_org_ids = self.request.user.get_organization_ids()
 
         return SubscriptionInvoice.objects.filter(
             subscription__organization_id__in=user_org_ids
@@ -494,9 +490,7 @@ class UsageRecordViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Return usage records for user's organization subscriptions"""
-        user_org_ids = self.request.user.organization_memberships.filter(
-            is_active=True
-        ).values_list('organization_id', flat=True)
+        user_org_ids = self.request.user.get_organization_ids()
 
         queryset = UsageRecord.objects.filter(
             subscription__organization_id__in=user_org_ids
@@ -2,6 +2,7 @@ import time
 from django.utils.deprecation import MiddlewareMixin
 from django.http import JsonResponse
 from django.utils import timezone
+from apps.users.utils import get_client_ip
 from .models import OrganizationAPIKey, APIKeyUsageLog
 
 
@@ -91,17 +92,10 @@ class APIKeyRateLimitMiddleware(MiddlewareMixin):
         """
         Update or create usage log entry
         """
-        # Get client IP
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip_address = x_forwarded_for.split(',')[0]
-        else:
-            ip_address = request.META.get('REMOTE_ADDR', '0.0.0.0')
-
         # Create usage log
         APIKeyUsageLog.objects.create(
             api_key=api_key,
-            ip_address=ip_address,
+            ip_address=get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
             endpoint=request.path,
             method=request.method,
@@ -179,7 +173,7 @@ class APIKeyAuthenticationMiddleware(MiddlewareMixin):
                     }, status=401)
 
                 # Check IP restrictions
-                client_ip = self.get_client_ip(request)
+                client_ip = get_client_ip(request)
                 if not api_key_obj.is_ip_allowed(client_ip):
                     return JsonResponse({
                         'error': 'IP address not allowed'
@@ -197,13 +191,4 @@ class APIKeyAuthenticationMiddleware(MiddlewareMixin):
                     'error': 'Invalid API key'
                 }, status=401)
 
-        return None
-
-    def get_client_ip(self, request):
-        """Get client IP address from request"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        return ip
\ No newline at end of file
+        return None
\ No newline at end of file
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-16 11:00
+
+from django.db import migrations, models
+
+
+def backfill_is_privileged(apps, schema_editor):
+    OrganizationMember = apps.get_model('teams', 'OrganizationMember')
+    OrganizationMember.objects.filter(
+        role__name__in=['owner', 'admin']
+    ).update(is_privileged=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organizationmember',
+            name='is_privileged',
+            field=models.BooleanField(default=False, help_text='Denormalized flag: role is owner or admin'),
+        ),
+        migrations.RunPython(backfill_is_privileged, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-16 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teams', '0003_organizationmember_is_privileged'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='organizationmember',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user'], name='om_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organizationmember',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_privileged', True)), fields=['user', 'is_privileged'], name='om_active_priv_idx'),
+        ),
+    ]
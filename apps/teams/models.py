@@ -63,11 +63,12 @@ class Organization(BaseModel):
 
     def get_user_role(self, user):
         """Get a user role in this organization"""
-        try:
-            membership = self.members.get(user=user, is_active=True)
-            return membership.role
-        except OrganizationMember.DoesNotExist:
-            return None
+        # Fetch the role row directly instead of the membership and then its role
+        return Role.objects.filter(
+            organizationmember__organization=self,
+            organizationmember__user=user,
+            organizationmember__is_active=True
+        ).first()
 
     def has_member(self, user):
         """Check if user is a member of this organization"""
@@ -90,6 +91,9 @@ class Role(models.Model):
         (VIEWER, 'Viewer'),
     ]
 
+    # Roles with organization-wide management rights
+    PRIVILEGED_ROLES = (OWNER, ADMIN)
+
     name = models.CharField(max_length=50, choices=ROLE_CHOICES, unique=True)
     description = models.TextField(blank=True)
 
@@ -128,6 +132,10 @@ class OrganizationMember(BaseModel):
     )
 
     is_active = models.BooleanField(default=True)
+    is_privileged = models.BooleanField(
+        default=False,
+        help_text="Denormalized flag: role is owner or admin"
+    )
     joined_at = models.DateTimeField(auto_now_add=True)
     invited_by = models.ForeignKey(
         User,
@@ -141,6 +149,19 @@ class OrganizationMember(BaseModel):
         db_table = 'organization_members'
         unique_together = ['organization', 'user']
         ordering = ['-created_at']
+        indexes = [
+            # Partial indexes backing the per-request membership checks in user permissions
+            models.Index(
+                fields=['user'],
+                condition=models.Q(is_active=True),
+                name='om_active_user_idx'
+            ),
+            models.Index(
+                fields=['user', 'is_privileged'],
+                condition=models.Q(is_active=True, is_privileged=True),
+                name='om_active_priv_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.organization.name} ({self.role.name})"
@@ -1,6 +1,8 @@
 from rest_framework import permissions
 from rest_framework_api_key.permissions import BaseHasAPIKey
 
+from apps.users.utils import get_client_ip
+
 from .models import Organization, OrganizationAPIKey, Role
 
 
@@ -145,7 +147,7 @@ class HasOrganizationAPIKey(BaseHasAPIKey):
             return False
 
         # IP allowlist check
-        client_ip = self.get_client_ip(request)
+        client_ip = get_client_ip(request)
         if hasattr(api_key, "is_ip_allowed") and not api_key.is_ip_allowed(client_ip):
             return False
 
@@ -157,19 +159,13 @@ class HasOrganizationAPIKey(BaseHasAPIKey):
         self.log_api_usage(request, api_key)
         return True
 
-    def get_client_ip(self, request):
-        x_forwarded_for = request.META.get("HTTP_X_FORWARDED_FOR")
-        if x_forwarded_for:
-            return x_forwarded_for.split(",")[0].strip()
-        return request.META.get("REMOTE_ADDR")
-
     def log_api_usage(self, request, api_key):
         try:
             from .models import APIKeyUsageLog
 
             APIKeyUsageLog.objects.create(
                 api_key=api_key,
-                ip_address=self.get_client_ip(request),
+                ip_address=get_client_ip(request),
                 user_agent=request.META.get("HTTP_USER_AGENT", "")[:500],
                 endpoint=request.path,
                 method=request.method,
@@ -204,10 +200,11 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return False
 
         # Owner / creator check
-        if hasattr(obj, "owner") and getattr(obj.owner, "id", None) == getattr(user, "id", None):
+        # Compare FK ids so the related user row is never loaded
+        if getattr(obj, "owner_id", None) is not None and obj.owner_id == user.id:
             return True
 
-        if hasattr(obj, "created_by") and getattr(obj.created_by, "id", None) == getattr(user, "id", None):
+        if getattr(obj, "created_by_id", None) is not None and obj.created_by_id == user.id:
             return True
 
         # Organization role check
@@ -233,11 +230,11 @@ class IsOrganizationOwner(permissions.BasePermission):
             return False
 
         organization = _get_organization(org_id)
-        return bool(organization and organization.owner == request.user)
+        return bool(organization and organization.owner_id == request.user.id)
 
     def has_object_permission(self, request, view, obj):
         organization = _org_from_obj(obj)
-        return bool(organization and organization.owner == request.user)
+        return bool(organization and organization.owner_id == request.user.id)
 
 
 class CanManageAPIKeys(permissions.BasePermission):
@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
@@ -55,6 +55,14 @@ def create_default_roles(sender, instance, created, **kwargs):
         ])
 
 
+@receiver(pre_save, sender=OrganizationMember)
+def sync_membership_privilege(sender, instance, **kwargs):
+    """
+    Keep the denormalized is_privileged flag in step with the membership role
+    """
+    instance.is_privileged = instance.role.name in Role.PRIVILEGED_ROLES
+
+
 @receiver(post_save, sender=Invitation)
 def send_invitation_email(sender, instance, created, **kwargs):
     """
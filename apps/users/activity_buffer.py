@@ -0,0 +1,325 @@
+"""
+Redis-backed write buffer for high-volume user activity.
+
+Per-request activity rows, notifications and last-seen timestamps are
+queued in Redis and written in batches by the ``flush_activity_buffer``
+Celery task, instead of costing an INSERT and an UPDATE inside every request.
+
+Entries carry the time they were queued, so rows and last-seen timestamps
+record when the event happened even if the flush runs late.
+
+A flush moves each batch into a processing key before writing it and only
+deletes it once the write has committed, so a failed write is requeued and a
+crashed flush is picked up again by the next one.
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+
+from django.db import DataError, IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_QUEUE_KEY = 'billmunshi:activity_buffer:activities'
+NOTIFICATION_QUEUE_KEY = 'billmunshi:activity_buffer:notifications'
+LAST_SEEN_KEY = 'billmunshi:activity_buffer:last_seen'
+
+# Maximum number of queued activities (or notifications) written per batch
+FLUSH_BATCH_SIZE = 1000
+
+# Suffix of the key holding the batch currently being written from a queue
+PROCESSING_SUFFIX = ':processing'
+
+# Only one flush runs at a time, since the processing keys are shared
+FLUSH_LOCK_KEY = 'billmunshi:activity_buffer:flush_lock'
+FLUSH_LOCK_SECONDS = 60
+
+# Seconds a flush keeps draining batches before leaving the rest to the next run
+FLUSH_TIME_BUDGET_SECONDS = 10
+
+# Claim the next batch: a batch left behind by a crashed flush first,
+# otherwise up to ARGV[1] entries moved from the head of the queue
+CLAIM_BATCH_SCRIPT = """
+local pending = redis.call('LRANGE', KEYS[2], 0, -1)
+if #pending > 0 then
+    return pending
+end
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+# Put a failed batch back at the head of its queue, in its original order
+REQUEUE_BATCH_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[2], 0, -1)
+for i = #items, 1, -1 do
+    redis.call('LPUSH', KEYS[1], items[i])
+end
+redis.call('DEL', KEYS[2])
+return #items
+"""
+
+# Claim the last-seen map, or the one left behind by a crashed flush
+CLAIM_LAST_SEEN_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+end
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# Merge a failed last-seen map back without overwriting newer touches
+RESTORE_LAST_SEEN_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[2])
+for i = 1, #items, 2 do
+    redis.call('HSETNX', KEYS[1], items[i], items[i + 1])
+end
+redis.call('DEL', KEYS[2])
+return #items / 2
+"""
+
+
+def enqueue(user_id, action, ip_address=None, user_agent='', metadata=None, **fields):
+    """
+    Queue a UserActivity row for the next flush
+
+    Extra keyword arguments are passed through as UserActivity field values
+    (e.g. description, organization_id, endpoint, status_code).
+    """
+    entry = {
+        'user_id': user_id,
+        'action': action,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'metadata': metadata or None,
+        'created_at': timezone.now().isoformat(),
+        **fields,
+    }
+
+    try:
+        get_redis_connection('default').rpush(ACTIVITY_QUEUE_KEY, json.dumps(entry))
+    except Exception as exc:
+        # Never drop an activity because Redis is unavailable
+        logger.warning(f"Activity buffer unavailable, writing directly: {str(exc)}")
+        from .models import UserActivity
+        UserActivity.objects.create(**_activity_fields(entry))
+
+
+def enqueue_notification(user_id, title, message, notification_type='info', **fields):
+    """
+    Queue a UserNotification row for the next flush
+
+    Extra keyword arguments are passed through as UserNotification field values
+    (e.g. organization_id, action_url, action_text, metadata).
+    """
+    entry = {
+        'user_id': user_id,
+        'title': title,
+        'message': message,
+        'notification_type': notification_type,
+        **fields,
+    }
+
+    try:
+        get_redis_connection('default').rpush(NOTIFICATION_QUEUE_KEY, json.dumps(entry))
+    except Exception as exc:
+        logger.warning(f"Activity buffer unavailable, writing directly: {str(exc)}")
+        _write_notifications([json.dumps(entry)])
+
+
+def touch_last_activity(user_id, ip_address=None):
+    """
+    Record that a user was just seen; repeated touches before a flush collapse into the latest
+    """
+    touch = json.dumps([ip_address or '', timezone.now().isoformat()])
+
+    try:
+        get_redis_connection('default').hset(LAST_SEEN_KEY, str(user_id), touch)
+    except Exception as exc:
+        logger.warning(f"Activity buffer unavailable, writing directly: {str(exc)}")
+        _update_last_seen({str(user_id): touch})
+
+
+def flush():
+    """
+    Write buffered activities, notifications and last-seen timestamps to the database
+
+    Each queue is drained until it is empty or the time budget runs out; every
+    category is written independently, so one failing doesn't hold up the others.
+    Returns a tuple of (activities written, notifications written, users touched).
+    """
+    redis = get_redis_connection('default')
+
+    if not redis.set(FLUSH_LOCK_KEY, 1, nx=True, ex=FLUSH_LOCK_SECONDS):
+        return 0, 0, 0
+
+    try:
+        deadline = time.monotonic() + FLUSH_TIME_BUDGET_SECONDS
+        activities_written = _drain_queue(redis, ACTIVITY_QUEUE_KEY, _write_activities, deadline)
+        notifications_written = _drain_queue(redis, NOTIFICATION_QUEUE_KEY, _write_notifications, deadline)
+        users_touched = _flush_last_seen(redis)
+    finally:
+        redis.delete(FLUSH_LOCK_KEY)
+
+    return activities_written, notifications_written, users_touched
+
+
+def _drain_queue(redis, queue_key, write, deadline):
+    """Write batches from a queue until it is empty or the deadline passes"""
+    processing_key = queue_key + PROCESSING_SUFFIX
+    claim_batch = redis.register_script(CLAIM_BATCH_SCRIPT)
+
+    written = 0
+    while True:
+        batch = claim_batch(keys=[queue_key, processing_key], args=[FLUSH_BATCH_SIZE])
+        if not batch:
+            return written
+
+        try:
+            written += _write_batch(write, batch)
+        except Exception as exc:
+            redis.register_script(REQUEUE_BATCH_SCRIPT)(keys=[queue_key, processing_key])
+            logger.error(f"Failed to flush {queue_key}, batch requeued: {str(exc)}")
+            return written
+
+        # The batch is committed; only now drop it from Redis
+        redis.delete(processing_key)
+
+        if time.monotonic() >= deadline:
+            return written
+
+
+def _write_batch(write, batch):
+    """Write a batch, falling back to one entry at a time if some entries can never be written"""
+    try:
+        return write(batch)
+    except (IntegrityError, DataError):
+        # e.g. an entry for a user deleted since it was queued; retrying the
+        # whole batch would fail forever, so drop just the bad entries
+        written = 0
+        for raw in batch:
+            try:
+                written += write([raw])
+            except (IntegrityError, DataError) as exc:
+                logger.error(f"Dropping unwritable buffered entry {raw!r}: {str(exc)}")
+        return written
+
+
+def _flush_last_seen(redis):
+    """Apply the buffered last-seen map, merging it back into Redis if the write fails"""
+    processing_key = LAST_SEEN_KEY + PROCESSING_SUFFIX
+    items = redis.register_script(CLAIM_LAST_SEEN_SCRIPT)(keys=[LAST_SEEN_KEY, processing_key])
+    if not items:
+        return 0
+
+    last_seen = {
+        user_id.decode(): touch.decode()
+        for user_id, touch in zip(items[::2], items[1::2])
+    }
+
+    try:
+        users_touched = _update_last_seen(last_seen)
+    except Exception as exc:
+        redis.register_script(RESTORE_LAST_SEEN_SCRIPT)(keys=[LAST_SEEN_KEY, processing_key])
+        logger.error(f"Failed to flush last-seen timestamps, requeued: {str(exc)}")
+        return 0
+
+    redis.delete(processing_key)
+    return users_touched
+
+
+def _write_activities(raw_entries):
+    """Bulk insert queued activity entries"""
+    if not raw_entries:
+        return 0
+
+    from .models import UserActivity
+
+    activities = []
+    for raw in raw_entries:
+        entry = _activity_fields(json.loads(raw))
+        queued_at = _parse_queued_at(entry.pop('created_at', None))
+        activities.append(UserActivity(**entry, created_at=queued_at, updated_at=queued_at))
+
+    # bulk_create() would let auto_now_add overwrite created_at with the flush
+    # time; a raw insert keeps the queued timestamps. Batches never exceed
+    # FLUSH_BATCH_SIZE, so one INSERT covers them.
+    fields = [field for field in UserActivity._meta.concrete_fields if not field.primary_key]
+
+    with transaction.atomic():
+        # Activity telemetry doesn't need to wait for the WAL flush;
+        # a crash can only lose the last few rows, never corrupt the table
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL synchronous_commit TO OFF")
+
+        UserActivity.objects._insert(activities, fields=fields, raw=True)
+
+    return len(activities)
+
+
+def _write_notifications(raw_notifications):
+    """Bulk insert queued notifications"""
+    if not raw_notifications:
+        return 0
+
+    from .models import UserNotification
+
+    notifications = [UserNotification(**json.loads(raw)) for raw in raw_notifications]
+    UserNotification.bulk_insert(notifications)
+
+    return len(notifications)
+
+
+def _activity_fields(entry):
+    """Map a queued entry to UserActivity field values"""
+    from .models import UserAgent
+
+    entry['user_agent_id'] = UserAgent.intern(entry.pop('user_agent', ''))
+    return entry
+
+
+def _parse_queued_at(value):
+    """Parse an entry's queue time; entries queued before timestamps were recorded use now"""
+    return (value and parse_datetime(value)) or timezone.now()
+
+
+def _parse_touch(touch):
+    """Split a buffered last-seen value into (ip_address, seen_at)"""
+    try:
+        ip_address, seen_at = json.loads(touch)
+    except ValueError:
+        # Bare IP address queued before timestamps were recorded
+        return touch, timezone.now()
+    return ip_address, _parse_queued_at(seen_at)
+
+
+def _update_last_seen(last_seen):
+    """Apply last-seen timestamps with one bulk UPDATE for users with an IP and one for the rest"""
+    if not last_seen:
+        return 0
+
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+    users_by_fields = defaultdict(list)
+    for user_id, touch in last_seen.items():
+        ip_address, seen_at = _parse_touch(touch)
+        user = User(pk=int(user_id), last_activity_at=seen_at, last_login_ip=ip_address or None)
+        fields = ('last_activity_at', 'last_login_ip') if ip_address else ('last_activity_at',)
+        users_by_fields[fields].append(user)
+
+    with transaction.atomic():
+        for fields, users in users_by_fields.items():
+            User.objects.bulk_update(users, fields, batch_size=FLUSH_BATCH_SIZE)
+
+    return len(last_seen)
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
 
+from apps.users.utils import get_client_ip
+
 User = get_user_model()
 
 
@@ -236,7 +238,7 @@ class CustomHeadlessAdapter(DefaultHeadlessAdapter):
         existing = UserSession.objects.filter(user=user, is_active=True)
 
         is_new_device = not existing.filter(
-            user_agent__icontains=self.extract_browser_info(user_agent)
+            user_agent__raw__icontains=self.extract_browser_info(user_agent)
         ).exists()
 
         if is_new_device and existing.exists():
@@ -268,10 +270,7 @@ class CustomHeadlessAdapter(DefaultHeadlessAdapter):
         return "Unknown"
 
     def get_client_ip(self, request):
-        xff = request.META.get("HTTP_X_FORWARDED_FOR")
-        if xff:
-            return xff.split(",")[0].strip()
-        return request.META.get("REMOTE_ADDR", "0.0.0.0")
+        return get_client_ip(request)
 
     def respond_user_session_changed(self, request, user):
         return {
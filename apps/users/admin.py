@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
@@ -14,6 +16,39 @@ from .models import (
 
 User = get_user_model()
 
+# Static status badges, rendered once instead of per row
+VERIFIED_HTML = {
+    True: mark_safe('<span style="color: green;">✓ Verified</span>'),
+    False: mark_safe('<span style="color: red;">✗ Not Verified</span>'),
+}
+ONBOARDED_HTML = {
+    True: mark_safe('<span style="color: green;">✓ Complete</span>'),
+    False: mark_safe('<span style="color: orange;">✗ Pending</span>'),
+}
+SESSION_ACTIVE_HTML = mark_safe('<span style="color: green;">✓ Active</span>')
+SESSION_EXPIRED_HTML = mark_safe('<span style="color: red;">✗ Expired</span>')
+SESSION_INACTIVE_HTML = mark_safe('<span style="color: orange;">✗ Inactive</span>')
+READ_HTML = {
+    True: mark_safe('<span style="color: green;">✓ Read</span>'),
+    False: mark_safe('<span style="color: orange;">✗ Unread</span>'),
+}
+
+
+# User columns needed by get_display_name() in list views
+USER_DISPLAY_FIELDS = ('user', 'user__username', 'user__email', 'user__first_name', 'user__last_name')
+
+
+def _is_changelist(request):
+    """Whether the request is for an admin changelist page"""
+    match = getattr(request, 'resolver_match', None)
+    return bool(match and match.url_name and match.url_name.endswith('_changelist'))
+
+
+@lru_cache(maxsize=None)
+def _organization_member_changelist_url():
+    """Resolve the membership changelist URL once; URLconf is static"""
+    return reverse('admin:teams_organizationmember_changelist')
+
 
 class UserPreferenceInline(admin.StackedInline):
     model = UserPreference
@@ -90,24 +125,24 @@ class CustomUserAdmin(UserAdmin):
 
     inlines = [UserPreferenceInline, UserActivityInline]
 
+    def get_queryset(self, request):
+        """Annotate organization counts to avoid COUNT queries per row"""
+        return super().get_queryset(request).with_counts()
+
     def is_verified_display(self, obj):
-        if obj.is_verified:
-            return format_html('<span style="color: green;">✓ Verified</span>')
-        return format_html('<span style="color: red;">✗ Not Verified</span>')
+        return VERIFIED_HTML[obj.is_verified]
 
     is_verified_display.short_description = 'Email Verified'
 
     def is_onboarded_display(self, obj):
-        if obj.is_onboarded:
-            return format_html('<span style="color: green;">✓ Complete</span>')
-        return format_html('<span style="color: orange;">✗ Pending</span>')
+        return ONBOARDED_HTML[obj.is_onboarded]
 
     is_onboarded_display.short_description = 'Onboarding'
 
     def total_organizations_display(self, obj):
         count = obj.total_organizations
         if count > 0:
-            url = reverse('admin:teams_organizationmember_changelist') + f'?user__id={obj.id}'
+            url = _organization_member_changelist_url() + f'?user__id={obj.id}'
             return format_html('<a href="{}">{} orgs</a>', url, count)
         return '0 orgs'
 
@@ -122,11 +157,13 @@ class CustomUserAdmin(UserAdmin):
 
     def save_model(self, request, obj, form, change):
         """Custom save logic"""
-        super().save_model(request, obj, form, change)
+        if change:
+            obj.save_except_counters()
+        else:
+            super().save_model(request, obj, form, change)
 
         # Create user preferences if they don't exist
-        if not hasattr(obj, 'preferences'):
-            UserPreference.objects.create(user=obj)
+        UserPreference.objects.get_or_create(user=obj)
 
 
 @admin.register(UserPreference)
@@ -185,6 +222,10 @@ class UserActivityAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     autocomplete_fields = ['user', 'organization']
     date_hierarchy = 'created_at'
+    list_per_page = 50
+    show_full_result_count = False
+    list_select_related = ['user', 'organization']
+    ordering = ['-created_at']
 
     fieldsets = (
         ('Activity Details', {
@@ -193,6 +234,10 @@ class UserActivityAdmin(admin.ModelAdmin):
         ('Context', {
             'fields': ('organization', 'ip_address', 'user_agent')
         }),
+        ('API Request', {
+            'fields': ('endpoint', 'method', 'status_code', 'response_time_ms'),
+            'classes': ('collapse',)
+        }),
         ('Metadata', {
             'fields': ('metadata',),
             'classes': ('collapse',)
@@ -203,6 +248,17 @@ class UserActivityAdmin(admin.ModelAdmin):
         })
     )
 
+    def get_queryset(self, request):
+        """Load only the columns rendered by the changelist"""
+        queryset = super().get_queryset(request)
+        if _is_changelist(request):
+            queryset = queryset.select_related('user', 'organization').only(
+                'id', 'action', 'ip_address', 'created_at',
+                'organization', 'organization__name',
+                *USER_DISPLAY_FIELDS
+            )
+        return queryset
+
     def user_display(self, obj):
         return obj.user.get_display_name()
 
@@ -231,11 +287,15 @@ class UserSessionAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'created_at', 'expires_at', 'country']
     search_fields = [
         'user__email', 'user__first_name', 'user__last_name',
-        'session_key', 'ip_address', 'user_agent'
+        'session_key', 'ip_address', 'user_agent__raw'
     ]
-    readonly_fields = ['session_key', 'created_at', 'updated_at', 'browser_info']
+    readonly_fields = ['session_key', 'user_agent', 'created_at', 'updated_at', 'browser_info']
     autocomplete_fields = ['user']
     date_hierarchy = 'created_at'
+    list_per_page = 50
+    show_full_result_count = False
+    list_select_related = ['user', 'user_agent']
+    ordering = ['-created_at']
 
     fieldsets = (
         ('Session Details', {
@@ -256,6 +316,17 @@ class UserSessionAdmin(admin.ModelAdmin):
         })
     )
 
+    def get_queryset(self, request):
+        """Load only the columns rendered by the changelist"""
+        queryset = super().get_queryset(request)
+        if _is_changelist(request):
+            queryset = queryset.select_related('user', 'user_agent').only(
+                'id', 'session_key', 'ip_address', 'user_agent__raw',
+                'is_active', 'last_activity', 'expires_at',
+                *USER_DISPLAY_FIELDS
+            )
+        return queryset
+
     def user_display(self, obj):
         return obj.user.get_display_name()
 
@@ -267,38 +338,19 @@ class UserSessionAdmin(admin.ModelAdmin):
     session_key_short.short_description = 'Session Key'
 
     def is_active_display(self, obj):
-        if obj.is_active and not obj.is_expired:
-            return format_html('<span style="color: green;">✓ Active</span>')
-        elif obj.is_expired:
-            return format_html('<span style="color: red;">✗ Expired</span>')
+        is_expired = obj.is_expired
+        if obj.is_active and not is_expired:
+            return SESSION_ACTIVE_HTML
+        elif is_expired:
+            return SESSION_EXPIRED_HTML
         else:
-            return format_html('<span style="color: orange;">✗ Inactive</span>')
+            return SESSION_INACTIVE_HTML
 
     is_active_display.short_description = 'Status'
 
     def browser_info(self, obj):
         """Extract browser info from user agent"""
-        user_agent = obj.user_agent.lower()
-
-        if 'chrome' in user_agent:
-            browser = 'Chrome'
-        elif 'firefox' in user_agent:
-            browser = 'Firefox'
-        elif 'safari' in user_agent:
-            browser = 'Safari'
-        elif 'edge' in user_agent:
-            browser = 'Edge'
-        else:
-            browser = 'Unknown'
-
-        if 'mobile' in user_agent:
-            device = 'Mobile'
-        elif 'tablet' in user_agent:
-            device = 'Tablet'
-        else:
-            device = 'Desktop'
-
-        return f"{browser} on {device}"
+        return obj.browser_info
 
     browser_info.short_description = 'Browser/Device'
 
@@ -306,11 +358,7 @@ class UserSessionAdmin(admin.ModelAdmin):
 
     def terminate_sessions(self, request, queryset):
         """Terminate selected sessions"""
-        count = 0
-        for session in queryset:
-            if session.is_active:
-                session.terminate()
-                count += 1
+        count = queryset.filter(is_active=True).update(is_active=False)
 
         self.message_user(
             request,
@@ -336,6 +384,10 @@ class UserNotificationAdmin(admin.ModelAdmin):
     readonly_fields = ['read_at', 'created_at', 'updated_at']
     autocomplete_fields = ['user', 'organization']
     date_hierarchy = 'created_at'
+    list_per_page = 50
+    show_full_result_count = False
+    list_select_related = ['user', 'organization']
+    ordering = ['-created_at']
 
     fieldsets = (
         ('Notification Details', {
@@ -360,15 +412,37 @@ class UserNotificationAdmin(admin.ModelAdmin):
         })
     )
 
+    def get_queryset(self, request):
+        """Load only the columns rendered by the changelist"""
+        queryset = super().get_queryset(request)
+        if _is_changelist(request):
+            queryset = queryset.select_related('user', 'organization').only(
+                'id', 'title', 'notification_type', 'is_read', 'created_at',
+                'organization', 'organization__name',
+                *USER_DISPLAY_FIELDS
+            )
+        return queryset
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {'user', 'is_read'} & set(form.changed_data):
+            user_ids = {obj.user_id, form.initial.get('user')} - {None}
+            User.objects.filter(pk__in=user_ids).sync_unread_notifications_count()
+
+    @staticmethod
+    def _sync_unread_counts(queryset):
+        """Recount unread notifications for the owners of the given notifications"""
+        User.objects.filter(
+            pk__in=queryset.order_by().values('user_id')
+        ).sync_unread_notifications_count()
+
     def user_display(self, obj):
         return obj.user.get_display_name()
 
     user_display.short_description = 'User'
 
     def is_read_display(self, obj):
-        if obj.is_read:
-            return format_html('<span style="color: green;">✓ Read</span>')
-        return format_html('<span style="color: orange;">✗ Unread</span>')
+        return READ_HTML[obj.is_read]
 
     is_read_display.short_description = 'Status'
 
@@ -382,6 +456,7 @@ class UserNotificationAdmin(admin.ModelAdmin):
             is_read=True,
             read_at=timezone.now()
         )
+        self._sync_unread_counts(queryset)
 
         self.message_user(
             request,
@@ -396,6 +471,7 @@ class UserNotificationAdmin(admin.ModelAdmin):
             is_read=False,
             read_at=None
         )
+        self._sync_unread_counts(queryset)
 
         self.message_user(
             request,
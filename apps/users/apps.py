@@ -8,4 +8,4 @@ class UsersConfig(AppConfig):
 
     def ready(self):
         # Import signals to ensure they are registered
-        import apps.users.signals
\ No newline at end of file
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -1,13 +1,53 @@
+import itertools
 import time
 from django.utils.deprecation import MiddlewareMixin
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.http import JsonResponse
 
-from .models import UserSession, UserActivity
+from . import activity_buffer
+from .models import UserAgent, UserSession, UserPreference
+from .utils import get_client_ip
 
 User = get_user_model()
 
+# Request counter used to sample session cleanup without touching the PRNG
+_session_cleanup_counter = itertools.count(1)
+
+# Prefix of requests tracked by APIUsageTrackingMiddleware
+API_PATH_PREFIX = '/api/'
+
+# Window in which repeated GETs of the same endpoint are logged only once
+API_ACTIVITY_DEDUPE_SECONDS = 60
+
+# Paths exempt from the onboarding redirect, checked with a single startswith call
+ONBOARDING_SKIP_PATHS = (
+    '/api/',
+    '/admin/',
+    '/users/complete-onboarding/',
+    '/accounts/logout/',
+    '/static/',
+    '/media/',
+    '/onboarding/',
+)
+
+# Static security headers, built once at import time
+SECURITY_HEADERS = (
+    ('Content-Security-Policy', (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data: https:; "
+        "connect-src 'self';"
+    )),
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'DENY'),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+)
+HSTS_HEADER = ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains')
+
 
 class UserActivityTrackingMiddleware(MiddlewareMixin):
     """
@@ -19,20 +59,19 @@ class UserActivityTrackingMiddleware(MiddlewareMixin):
         Track user activity on each request
         """
         if request.user.is_authenticated:
-            # Update user's last activity
-            ip_address = self.get_client_ip(request)
-            request.user.update_last_activity(ip_address)
+            # Queue the last-seen update; flush_activity_buffer applies it in batches
+            ip_address = get_client_ip(request)
+            activity_buffer.touch_last_activity(request.user.id, ip_address)
 
             # Update session last activity if session exists
             if hasattr(request, 'session') and request.session.session_key:
-                try:
-                    user_session = UserSession.objects.get(
-                        session_key=request.session.session_key,
-                        user=request.user
-                    )
-                    user_session.last_activity = timezone.now()
-                    user_session.save(update_fields=['last_activity'])
-                except UserSession.DoesNotExist:
+                # Update in place without loading the row or holding a lock across queries
+                updated = UserSession.objects.filter(
+                    session_key=request.session.session_key,
+                    user=request.user
+                ).update(last_activity=timezone.now())
+
+                if not updated:
                     # Create session if it doesn't exist
                     self.create_user_session(request)
 
@@ -54,7 +93,7 @@ class UserActivityTrackingMiddleware(MiddlewareMixin):
             seconds=request.session.get_expiry_age()
         )
 
-        ip_address = self.get_client_ip(request)
+        ip_address = get_client_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')
 
         UserSession.objects.get_or_create(
@@ -62,35 +101,27 @@ class UserActivityTrackingMiddleware(MiddlewareMixin):
             defaults={
                 'user': request.user,
                 'ip_address': ip_address,
-                'user_agent': user_agent,
+                'user_agent_id': UserAgent.intern(user_agent),
                 'is_active': True,
                 'expires_at': expires_at,
             }
         )
 
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        return ip
-
 
 class SessionCleanupMiddleware(MiddlewareMixin):
     """
     Middleware to clean up expired sessions periodically
+
+    The scheduled ``cleanup_expired_sessions`` Celery task is the primary
+    cleanup path; this middleware is only a fallback trigger.
     """
 
     def process_request(self, request):
         """
         Occasionally clean up expired sessions
         """
-        import random
-
-        # Only run cleanup 1% of the time to avoid performance issues
-        if random.randint(1, 100) == 1:
+        # Only run cleanup once every 1024 requests to avoid performance issues
+        if next(_session_cleanup_counter) & 1023 == 0:
             self.cleanup_expired_sessions()
 
         return None
@@ -129,8 +160,6 @@ class UserPreferenceMiddleware(MiddlewareMixin):
         """
         if request.user.is_authenticated:
             # Get or create user preferences
-            from .models import UserPreference
-
             try:
                 preferences = request.user.preferences
             except UserPreference.DoesNotExist:
@@ -151,7 +180,7 @@ class APIUsageTrackingMiddleware(MiddlewareMixin):
         Track API requests for authenticated users
         """
         # Only track API requests (adjust path pattern as needed)
-        if not request.path.startswith('/api/'):
+        if not request.path_info.startswith(API_PATH_PREFIX):
             return None
 
         if request.user.is_authenticated:
@@ -165,6 +194,10 @@ class APIUsageTrackingMiddleware(MiddlewareMixin):
         """
         Log API usage after request completion
         """
+        # Cheap prefix check first so non-API responses skip the attribute lookup
+        if not request.path_info.startswith(API_PATH_PREFIX):
+            return response
+
         if not getattr(request, '_track_api_usage', False):
             return response
 
@@ -209,33 +242,30 @@ class APIUsageTrackingMiddleware(MiddlewareMixin):
 
             action = action_map.get(request.method, 'api_request')
 
+            # Collapse repeated reads (polling, auto-refresh) into one row per window
+            if request.method == 'GET':
+                dedupe_key = f"api_activity:{request.user.id}:{request.method}:{request.path}"
+                if not cache.add(dedupe_key, 1, API_ACTIVITY_DEDUPE_SECONDS):
+                    return
+
             # Get organization context if available
             organization = getattr(request, 'organization', None)
 
-            UserActivity.objects.create(
-                user=request.user,
+            # Queued and bulk inserted by flush_activity_buffer; API actions are
+            # never inspected by the UserActivity signal handlers
+            activity_buffer.enqueue(
+                user_id=request.user.id,
                 action=action,
                 description=f"API {request.method} {request.path}",
-                ip_address=self.get_client_ip(request),
+                ip_address=get_client_ip(request),
                 user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                organization=organization,
-                metadata={
-                    'endpoint': request.path,
-                    'method': request.method,
-                    'status_code': response.status_code,
-                    'response_time_ms': response_time_ms
-                }
+                organization_id=organization.id if organization else None,
+                endpoint=request.path[:255],
+                method=request.method,
+                status_code=response.status_code,
+                response_time_ms=response_time_ms
             )
 
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
-        return ip
-
 
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """
@@ -248,23 +278,13 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
         """
         # Only add headers for authenticated users on sensitive pages
         if request.user.is_authenticated:
-            # Add Content Security Policy
-            response['Content-Security-Policy'] = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data: https:; "
-                "connect-src 'self';"
-            )
-
-            # Add other security headers
-            response['X-Content-Type-Options'] = 'nosniff'
-            response['X-Frame-Options'] = 'DENY'
-            response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+            # Add Content Security Policy and other security headers
+            for header, value in SECURITY_HEADERS:
+                response.headers[header] = value
 
             # Add HSTS for HTTPS
             if request.is_secure():
-                response['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+                response.headers[HSTS_HEADER[0]] = HSTS_HEADER[1]
 
         return response
 
@@ -279,25 +299,13 @@ class OnboardingRedirectMiddleware(MiddlewareMixin):
         Redirect to onboarding if user is authenticated but not onboarded
         """
         # Skip for certain paths
-        skip_paths = [
-            '/api/',
-            '/admin/',
-            '/users/complete-onboarding/',
-            '/accounts/logout/',
-            '/static/',
-            '/media/',
-        ]
-
-        if any(request.path.startswith(path) for path in skip_paths):
+        if request.path.startswith(ONBOARDING_SKIP_PATHS):
             return None
 
-        if (request.user.is_authenticated and
-                not request.user.is_onboarded and
-                not request.path.startswith('/onboarding/')):
+        if request.user.is_authenticated and not request.user.is_onboarded:
 
             # For API requests, return JSON response
             if request.path.startswith('/api/'):
-                from django.http import JsonResponse
                 return JsonResponse({
                     'error': 'Onboarding required',
                     'message': 'Please complete your profile setup',
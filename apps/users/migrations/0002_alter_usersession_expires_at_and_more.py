@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-16 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usersession',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='usersession',
+            name='is_active',
+            field=models.BooleanField(db_index=True, default=True),
+        ),
+    ]
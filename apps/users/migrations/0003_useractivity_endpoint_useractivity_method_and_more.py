@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-16 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_usersession_expires_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useractivity',
+            name='endpoint',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='method',
+            field=models.CharField(blank=True, db_index=True, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='response_time_ms',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
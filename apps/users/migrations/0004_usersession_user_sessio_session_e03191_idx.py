@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-16 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_useractivity_endpoint_useractivity_method_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(fields=['session_key', 'user'], name='user_sessio_session_e03191_idx'),
+        ),
+    ]
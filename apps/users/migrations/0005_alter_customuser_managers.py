@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-16 10:30
+
+import apps.users.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_usersession_user_sessio_session_e03191_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', apps.users.models.CustomUserManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-16 11:15
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_gravatar_hash(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+
+    users = []
+    for user in CustomUser.objects.only('id', 'email').iterator(chunk_size=2000):
+        email = user.email.lower().strip() if user.email else ''
+        user.gravatar_hash = hashlib.sha256(email.encode("utf-8")).hexdigest()
+        users.append(user)
+
+    CustomUser.objects.bulk_update(users, ['gravatar_hash'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_customuser_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='gravatar_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_gravatar_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-16 12:15
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_user_agents(apps, schema_editor):
+    UserAgent = apps.get_model('users', 'UserAgent')
+    quote_name = schema_editor.quote_name
+
+    for model_name in ('UserActivity', 'UserSession'):
+        model = apps.get_model('users', model_name)
+        raw_agents = model.objects.exclude(user_agent='').values_list(
+            'user_agent', flat=True
+        ).order_by().distinct()
+
+        UserAgent.objects.bulk_create(
+            (
+                UserAgent(hash=hashlib.sha1(raw.encode("utf-8")).hexdigest(), raw=raw)
+                for raw in raw_agents.iterator()
+            ),
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+
+        # One joined UPDATE per table instead of one table scan per distinct agent
+        table = quote_name(model._meta.db_table)
+        schema_editor.execute(
+            f"UPDATE {table} SET {quote_name('user_agent_hash')} = ua.{quote_name('hash')} "
+            f"FROM {quote_name(UserAgent._meta.db_table)} ua "
+            f"WHERE ua.{quote_name('raw')} = {table}.{quote_name('user_agent')}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_customuser_gravatar_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAgent',
+            fields=[
+                ('hash', models.CharField(help_text='SHA1 of the raw user agent', max_length=40, primary_key=True, serialize=False)),
+                ('raw', models.TextField()),
+            ],
+            options={
+                'db_table': 'user_agents',
+            },
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='user_agent_ref',
+            field=models.ForeignKey(blank=True, db_column='user_agent_hash', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.useragent'),
+        ),
+        migrations.AddField(
+            model_name='usersession',
+            name='user_agent_ref',
+            field=models.ForeignKey(blank=True, db_column='user_agent_hash', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='users.useragent'),
+        ),
+        migrations.RunPython(move_user_agents, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='useractivity',
+            name='user_agent',
+        ),
+        migrations.RemoveField(
+            model_name='usersession',
+            name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='useractivity',
+            old_name='user_agent_ref',
+            new_name='user_agent',
+        ),
+        migrations.RenameField(
+            model_name='usersession',
+            old_name='user_agent_ref',
+            new_name='user_agent',
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.4 on 2026-10-16 12:45
+
+import apps.users.models
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+
+# Frozen copy of ACTIVITY_ACTION_CODES at the time of this migration
+ACTION_CODES = {
+    'other': 0, 'login': 1, 'logout': 2, 'profile_update': 3,
+    'password_change': 4, 'organization_create': 5, 'organization_join': 6,
+    'organization_leave': 7, 'api_key_create': 8, 'api_key_delete': 9,
+    'invitation_sent': 10, 'invitation_accept': 11, 'invitation_decline': 12,
+    'email_verified': 13, 'email_change': 14, 'multiple_failed_logins': 15,
+    'onboarding_complete': 16, 'login_attempt': 17, 'account_created': 18,
+    'account_delete': 19, 'register': 20, 'password_reset_request': 21,
+    'password_reset_confirm': 22, 'api_create': 23, 'api_update': 24,
+    'api_delete': 25, 'api_access': 26, 'api_request': 27,
+}
+
+
+def convert_actions(apps, schema_editor):
+    UserActivity = apps.get_model('users', 'UserActivity')
+    UserActivity.objects.update(
+        action_code=Case(
+            *[When(action=slug, then=Value(code)) for slug, code in ACTION_CODES.items()],
+            default=Value(0),
+            output_field=models.PositiveSmallIntegerField()
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_useragent_split_user_agent'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='useractivity',
+            name='user_activi_action_cc4b37_idx',
+        ),
+        migrations.AddField(
+            model_name='useractivity',
+            name='action_code',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(convert_actions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='useractivity',
+            name='action',
+        ),
+        migrations.RenameField(
+            model_name='useractivity',
+            old_name='action_code',
+            new_name='action',
+        ),
+        migrations.AlterField(
+            model_name='useractivity',
+            name='action',
+            field=apps.users.models.ActivityActionField(choices=[('other', 'Other'), ('login', 'User Login'), ('logout', 'User Logout'), ('profile_update', 'Profile Updated'), ('password_change', 'Password Changed'), ('organization_create', 'Organization Created'), ('organization_join', 'Joined Organization'), ('organization_leave', 'Left Organization'), ('api_key_create', 'API Key Created'), ('api_key_delete', 'API Key Deleted'), ('invitation_sent', 'Invitation Sent'), ('invitation_accept', 'Invitation Accepted'), ('invitation_decline', 'Invitation Declined'), ('email_verified', 'Email Verified'), ('email_change', 'Email Changed'), ('multiple_failed_logins', 'Multiple Failed Logins'), ('onboarding_complete', 'Onboarding Completed'), ('login_attempt', 'Login Attempt'), ('account_created', 'Account Created'), ('account_delete', 'Account Deleted'), ('register', 'Registered'), ('password_reset_request', 'Password Reset Requested'), ('password_reset_confirm', 'Password Reset Confirmed'), ('api_create', 'API Create'), ('api_update', 'API Update'), ('api_delete', 'API Delete'), ('api_access', 'API Access'), ('api_request', 'API Request')]),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['action', '-created_at'], name='user_activi_action_cc4b37_idx'),
+        ),
+    ]
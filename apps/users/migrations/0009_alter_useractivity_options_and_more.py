@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-16 13:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_useractivity_action_code'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='useractivity',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='usernotification',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='usersession',
+            options={},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-16 13:30
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_alter_useractivity_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='useractivity',
+            name='metadata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='usernotification',
+            name='metadata',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['metadata'], name='ua_metadata_gin'),
+        ),
+    ]
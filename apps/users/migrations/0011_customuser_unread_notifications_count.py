@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-16 14:10
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_notifications_count(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    UserNotification = apps.get_model('users', 'UserNotification')
+
+    unread = UserNotification.objects.filter(
+        user=OuterRef('pk'),
+        is_read=False
+    ).order_by().values('user').annotate(count=Count('pk')).values('count')
+
+    CustomUser.objects.update(
+        unread_notifications_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_alter_useractivity_metadata_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Denormalized number of unread notifications'),
+        ),
+        migrations.RunPython(backfill_unread_notifications_count, migrations.RunPython.noop),
+    ]
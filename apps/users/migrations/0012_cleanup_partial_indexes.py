@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-16 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_customuser_unread_notifications_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersession',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='usersession_active_expiry'),
+        ),
+        migrations.AddIndex(
+            model_name='usernotification',
+            index=models.Index(condition=models.Q(('is_read', True)), fields=['created_at'], name='notif_read_cleanup'),
+        ),
+    ]
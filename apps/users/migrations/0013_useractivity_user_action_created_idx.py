@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-16 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_cleanup_partial_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='useractivity',
+            index=models.Index(fields=['user', 'action', '-created_at'], name='user_action_created_idx'),
+        ),
+    ]
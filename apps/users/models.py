@@ -1,22 +1,95 @@
 import hashlib
+import re
 import uuid
-from functools import cached_property
+from collections import Counter, defaultdict
 
 from allauth.account.models import EmailAddress
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.core.exceptions import ValidationError
 
 from apps.users.helpers import validate_profile_picture
 from apps.utils.models import BaseModel
 
+# Single-pass matchers for summarizing user agents; IGNORECASE avoids lowercasing a copy
+_BROWSER_RE = re.compile(r'(chrome|firefox|safari|edge)', re.IGNORECASE)
+_DEVICE_RE = re.compile(r'(mobile|tablet)', re.IGNORECASE)
+
+# Minimum seconds between last-activity writes for the same user and IP
+LAST_ACTIVITY_WRITE_INTERVAL = 60
+
+# CustomUser columns maintained with F() updates and skipped by full saves
+COUNTER_FIELDS = ('unread_notifications_count',)
+
 
 def _get_avatar_filename(instance, filename):
     """Use random filename prevent overwriting existing files & to fix caching issues."""
     return f"profile-pictures/{uuid.uuid4()}.{filename.split('.')[-1]}"
 
 
+class CustomUserQuerySet(models.QuerySet):
+    """
+    QuerySet with annotations for per-user values that would otherwise cost a query per row
+    """
+
+    def with_verification(self):
+        """Annotate whether each user has a verified email address"""
+        return self.annotate(
+            _has_verified_email=Exists(
+                EmailAddress.objects.filter(user=OuterRef('pk'), verified=True)
+            )
+        )
+
+    def with_counts(self):
+        """Annotate active membership and owned organization counts"""
+        return self.annotate(
+            _total_orgs=Count(
+                'organization_memberships',
+                filter=Q(organization_memberships__is_active=True),
+                distinct=True
+            ),
+            _owned_orgs=Count(
+                'owned_organizations',
+                filter=Q(owned_organizations__is_active=True),
+                distinct=True
+            )
+        )
+
+    def sync_unread_notifications_count(self):
+        """Recompute the stored unread notification counter for these users"""
+        unread = UserNotification.objects.filter(
+            user=OuterRef('pk'),
+            is_read=False
+        ).order_by().values('user').annotate(count=Count('pk')).values('count')
+
+        return self.update(
+            unread_notifications_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0)
+        )
+
+    def with_recent_activities(self, limit=5):
+        """Prefetch each user's latest activities into recent_activities_cached"""
+        return self.prefetch_related(
+            Prefetch(
+                'activities',
+                queryset=UserActivity.objects.select_related('organization').order_by('-created_at')[:limit],
+                to_attr='recent_activities_cached'
+            )
+        )
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    """
+    Default user manager exposing CustomUserQuerySet helpers
+    """
+    pass
+
+
 class CustomUser(AbstractUser):
     """
     Enhanced user model with additional fields for multi-tenant SaaS
@@ -80,18 +153,58 @@ class CustomUser(AbstractUser):
         help_text="Whether 2FA is enabled"
     )
 
+    # Gravatar hash of the normalized email, kept in sync by a pre_save signal
+    gravatar_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Kept in step by UserNotification with F() updates; never written by save()
+    unread_notifications_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Denormalized number of unread notifications"
+    )
+
+    objects = CustomUserManager()
+
     class Meta:
         db_table = 'users'
         ordering = ['-date_joined']
 
     def __str__(self):
-        return f"{self.get_full_name()} <{self.email or self.username}>"
+        return f"{self._full_name} <{self.email or self.username}>"
+
+    def save(self, *args, **kwargs):
+        # Names may have changed since the full name was memoized
+        self.__dict__.pop('_full_name', None)
+
+        # Store the Gravatar hash so avatar URLs don't rehash the email on every access
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'email' in update_fields:
+            self.gravatar_hash = self.compute_gravatar_hash(self.email)
+            if update_fields is not None and 'gravatar_hash' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'gravatar_hash']
+
+        super().save(*args, **kwargs)
+
+    def save_except_counters(self):
+        """
+        Save every field except the denormalized counters
+
+        The counters are only changed with F() updates, so a full save of an
+        instance loaded earlier would overwrite them with a stale value.
+        """
+        self.save(update_fields=[
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in COUNTER_FIELDS
+        ])
+
+    @cached_property
+    def _full_name(self) -> str:
+        """Full name, computed once per instance"""
+        return self.get_full_name()
 
     def get_display_name(self) -> str:
         """Get user's display name"""
-        if self.get_full_name().strip():
-            return self.get_full_name()
-        return self.email or self.username
+        return self._full_name or self.email or self.username
 
     def get_short_name(self) -> str:
         """Get user's short name"""
@@ -110,14 +223,21 @@ class CustomUser(AbstractUser):
     @property
     def gravatar_id(self) -> str:
         """Get Gravatar ID"""
-        # https://en.gravatar.com/site/implement/hash/
-        email = self.email.lower().strip() if self.email else ''
-        return hashlib.md5(email.encode("utf-8")).hexdigest()
+        # https://docs.gravatar.com/api/avatars/hash/
+        return self.gravatar_hash or self.compute_gravatar_hash(self.email)
 
-    @cached_property
+    @staticmethod
+    def compute_gravatar_hash(email) -> str:
+        """Compute the SHA256 Gravatar hash for an email address"""
+        email = email.lower().strip() if email else ''
+        return hashlib.sha256(email.encode("utf-8")).hexdigest()
+
+    @property
     def has_verified_email(self):
-        """Check if user has verified email"""
-        return EmailAddress.objects.filter(user=self, verified=True).exists()
+        """Check if user has verified email (uses the with_verification() annotation if present)"""
+        if not hasattr(self, '_has_verified_email'):
+            self._has_verified_email = EmailAddress.objects.filter(user=self, verified=True).exists()
+        return self._has_verified_email
 
     def get_organizations(self):
         """Get all organizations user is a member of"""
@@ -125,22 +245,38 @@ class CustomUser(AbstractUser):
             is_active=True
         ).select_related('organization', 'role')
 
-    def get_primary_organization(self):
-        """Get user's primary organization (first owned, then first joined)"""
-        # First try owned organizations
-        owned_org = self.owned_organizations.filter(is_active=True).first()
-        if owned_org:
-            return owned_org
-
-        # Then try first active membership
-        membership = self.organization_memberships.filter(
+    def get_organization_ids(self):
+        """Get IDs of organizations the user is an active member of, without loading rows"""
+        return self.organization_memberships.filter(
             is_active=True
-        ).select_related('organization').first()
+        ).values_list('organization_id', flat=True)
 
-        return membership.organization if membership else None
+    def get_primary_organization(self):
+        """Get user's primary organization (first owned, then first joined)"""
+        from apps.teams.models import Organization
+
+        # Owned organizations rank ahead of memberships; resolved in one query
+        owned = Organization.objects.filter(owner=self, is_active=True).annotate(
+            priority=Value(0, output_field=IntegerField()),
+            sort_at=F('created_at')
+        )
+        joined = Organization.objects.filter(
+            members__user=self,
+            members__is_active=True
+        ).annotate(
+            priority=Value(1, output_field=IntegerField()),
+            sort_at=F('members__created_at')
+        )
+
+        return owned.union(joined, all=True).order_by('priority', '-sort_at').first()
 
     def update_last_activity(self, ip_address=None):
         """Update user's last activity timestamp and IP"""
+        # Skip the write if we recorded activity recently and the IP hasn't changed
+        recently_written = not cache.add(f"uact:{self.pk}", 1, LAST_ACTIVITY_WRITE_INTERVAL)
+        if recently_written and (not ip_address or ip_address == self.last_login_ip):
+            return
+
         self.last_activity_at = timezone.now()
         if ip_address:
             self.last_login_ip = ip_address
@@ -161,12 +297,18 @@ class CustomUser(AbstractUser):
     @property
     def total_organizations(self):
         """Get total number of organizations user belongs to"""
-        return self.organization_memberships.filter(is_active=True).count()
+        total = getattr(self, '_total_orgs', None)
+        if total is None:
+            total = self.organization_memberships.filter(is_active=True).count()
+        return total
 
     @property
     def owned_organizations_count(self):
         """Get number of organizations user owns"""
-        return self.owned_organizations.filter(is_active=True).count()
+        owned = getattr(self, '_owned_orgs', None)
+        if owned is None:
+            owned = self.owned_organizations.filter(is_active=True).count()
+        return owned
 
 
 class UserPreference(BaseModel):
@@ -249,36 +391,125 @@ class UserPreference(BaseModel):
         return f"Preferences for {self.user.get_display_name()}"
 
 
+class UserAgent(models.Model):
+    """
+    Deduplicated user-agent strings referenced by activities and sessions
+    """
+    hash = models.CharField(max_length=40, primary_key=True, help_text="SHA1 of the raw user agent")
+    raw = models.TextField()
+
+    # Hashes known to be committed, so repeat writes skip the INSERT
+    _known_hashes = set()
+
+    class Meta:
+        db_table = 'user_agents'
+
+    def __str__(self):
+        return self.raw
+
+    @classmethod
+    def intern(cls, raw):
+        """Return the hash for a user-agent string, storing it on first use"""
+        if not raw:
+            return None
+
+        ua_hash = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        if ua_hash not in cls._known_hashes:
+            cls.objects.bulk_create([cls(hash=ua_hash, raw=raw)], ignore_conflicts=True)
+            if len(cls._known_hashes) > 10000:
+                cls._known_hashes.clear()
+            # Only remember the hash once the row can't be rolled back
+            transaction.on_commit(lambda: cls._known_hashes.add(ua_hash))
+        return ua_hash
+
+
+# Activity actions as (stored code, slug, label); codes are persisted, never renumber them
+ACTIVITY_ACTIONS = [
+    (0, 'other', 'Other'),
+    (1, 'login', 'User Login'),
+    (2, 'logout', 'User Logout'),
+    (3, 'profile_update', 'Profile Updated'),
+    (4, 'password_change', 'Password Changed'),
+    (5, 'organization_create', 'Organization Created'),
+    (6, 'organization_join', 'Joined Organization'),
+    (7, 'organization_leave', 'Left Organization'),
+    (8, 'api_key_create', 'API Key Created'),
+    (9, 'api_key_delete', 'API Key Deleted'),
+    (10, 'invitation_sent', 'Invitation Sent'),
+    (11, 'invitation_accept', 'Invitation Accepted'),
+    (12, 'invitation_decline', 'Invitation Declined'),
+    (13, 'email_verified', 'Email Verified'),
+    (14, 'email_change', 'Email Changed'),
+    (15, 'multiple_failed_logins', 'Multiple Failed Logins'),
+    (16, 'onboarding_complete', 'Onboarding Completed'),
+    (17, 'login_attempt', 'Login Attempt'),
+    (18, 'account_created', 'Account Created'),
+    (19, 'account_delete', 'Account Deleted'),
+    (20, 'register', 'Registered'),
+    (21, 'password_reset_request', 'Password Reset Requested'),
+    (22, 'password_reset_confirm', 'Password Reset Confirmed'),
+    (23, 'api_create', 'API Create'),
+    (24, 'api_update', 'API Update'),
+    (25, 'api_delete', 'API Delete'),
+    (26, 'api_access', 'API Access'),
+    (27, 'api_request', 'API Request'),
+]
+ACTIVITY_ACTION_CODES = {slug: code for code, slug, _ in ACTIVITY_ACTIONS}
+ACTIVITY_ACTION_SLUGS = {code: slug for code, slug, _ in ACTIVITY_ACTIONS}
+
+
+class ActivityActionField(models.Field):
+    """
+    Stores activity actions as small integer codes while exposing their slugs
+    """
+
+    def get_internal_type(self):
+        return 'PositiveSmallIntegerField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return ACTIVITY_ACTION_SLUGS.get(value, 'other')
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return ACTIVITY_ACTION_SLUGS.get(value, 'other')
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return ACTIVITY_ACTION_CODES[value]
+        except KeyError:
+            raise ValueError(f"Unknown activity action: {value!r}")
+
+
 class UserActivity(BaseModel):
     """
     Track user activities and actions
     """
-    ACTION_TYPES = [
-        ('login', 'User Login'),
-        ('logout', 'User Logout'),
-        ('profile_update', 'Profile Updated'),
-        ('password_change', 'Password Changed'),
-        ('organization_create', 'Organization Created'),
-        ('organization_join', 'Joined Organization'),
-        ('organization_leave', 'Left Organization'),
-        ('api_key_create', 'API Key Created'),
-        ('api_key_delete', 'API Key Deleted'),
-        ('invitation_sent', 'Invitation Sent'),
-        ('invitation_accept', 'Invitation Accepted'),
-        ('invitation_decline', 'Invitation Declined'),
-    ]
+    ACTION_TYPES = [(slug, label) for _, slug, label in ACTIVITY_ACTIONS]
 
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
         related_name='activities'
     )
-    action = models.CharField(max_length=50, choices=ACTION_TYPES)
+    action = ActivityActionField(choices=ACTION_TYPES)
     description = models.TextField(blank=True)
 
     # Context Information
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    user_agent = models.TextField(blank=True)
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        db_column='user_agent_hash',
+        related_name='+'
+    )
     organization = models.ForeignKey(
         'teams.Organization',
         on_delete=models.SET_NULL,
@@ -287,15 +518,22 @@ class UserActivity(BaseModel):
         help_text="Related organization if applicable"
     )
 
-    # Additional metadata
-    metadata = models.JSONField(default=dict, blank=True)
+    # API request details (populated for API usage tracking)
+    endpoint = models.CharField(max_length=255, blank=True, db_index=True)
+    method = models.CharField(max_length=8, blank=True, db_index=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, db_index=True)
+    response_time_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    # Additional metadata (NULL when there is none)
+    metadata = models.JSONField(null=True, blank=True)
 
     class Meta:
         db_table = 'user_activities'
-        ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['action', '-created_at']),
+            models.Index(fields=['user', 'action', '-created_at'], name='user_action_created_idx'),
+            GinIndex(fields=['metadata'], name='ua_metadata_gin'),
         ]
 
     def __str__(self):
@@ -313,28 +551,48 @@ class UserSession(BaseModel):
     )
     session_key = models.CharField(max_length=40, unique=True)
     ip_address = models.GenericIPAddressField()
-    user_agent = models.TextField(blank=True)
+    user_agent = models.ForeignKey(
+        UserAgent,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        db_column='user_agent_hash',
+        related_name='+'
+    )
 
     # Location Information (optional)
     country = models.CharField(max_length=100, blank=True)
     city = models.CharField(max_length=100, blank=True)
 
     # Session Status
-    is_active = models.BooleanField(default=True)
+    is_active = models.BooleanField(default=True, db_index=True)
     last_activity = models.DateTimeField(auto_now=True)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
 
     class Meta:
         db_table = 'user_sessions'
-        ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-last_activity']),
             models.Index(fields=['session_key']),
+            models.Index(fields=['session_key', 'user']),
+            # Partial index for cleanup_expired_sessions
+            models.Index(fields=['expires_at'], condition=Q(is_active=True), name='usersession_active_expiry'),
         ]
 
     def __str__(self):
         return f"{self.user.get_display_name()} - Session {self.session_key[:8]}..."
 
+    @property
+    def browser_info(self):
+        """Summarize the session's user agent as '<browser> on <device>'"""
+        user_agent = self.user_agent.raw if self.user_agent_id else ''
+        browser = _BROWSER_RE.search(user_agent)
+        device = _DEVICE_RE.search(user_agent)
+        return (
+            f"{browser.group(1).capitalize() if browser else 'Unknown'} on "
+            f"{device.group(1).capitalize() if device else 'Desktop'}"
+        )
+
     @property
     def is_expired(self):
         """Check if session is expired"""
@@ -346,6 +604,18 @@ class UserSession(BaseModel):
         self.save(update_fields=['is_active'])
 
 
+class UserNotificationQuerySet(models.QuerySet):
+    """
+    QuerySet that keeps owners' unread counters in step on bulk deletes
+    """
+
+    def delete(self):
+        """Delete the notifications and lower each owner's unread counter once"""
+        with transaction.atomic():
+            UserNotification.decrement_unread_counts(self)
+            return super().delete()
+
+
 class UserNotification(BaseModel):
     """
     In-app notifications for users
@@ -387,26 +657,92 @@ class UserNotification(BaseModel):
         blank=True
     )
 
-    # Metadata
-    metadata = models.JSONField(default=dict, blank=True)
+    # Metadata (NULL when there is none)
+    metadata = models.JSONField(null=True, blank=True)
+
+    objects = UserNotificationQuerySet.as_manager()
 
     class Meta:
         db_table = 'user_notifications'
-        ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read', '-created_at']),
             models.Index(fields=['notification_type', '-created_at']),
+            # Partial index for cleanup_old_notifications
+            models.Index(fields=['created_at'], condition=Q(is_read=True), name='notif_read_cleanup'),
         ]
 
     def __str__(self):
         return f"{self.user.get_display_name()} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding and not self.is_read:
+            self.adjust_unread_count([self.user_id], 1)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        if not self.is_read:
+            self.adjust_unread_count([self.user_id], -1)
+        return result
+
+    @staticmethod
+    def adjust_unread_count(user_ids, delta):
+        """Shift the stored unread counter of the given users by delta"""
+        if not delta:
+            return 0
+        return CustomUser.objects.filter(pk__in=user_ids).update(
+            unread_notifications_count=Greatest(F('unread_notifications_count') + delta, 0)
+        )
+
+    @classmethod
+    def decrement_unread_counts(cls, notifications):
+        """
+        Lower each owner's unread counter by their unread rows in notifications
+
+        Owners with the same number of unread rows share one UPDATE.
+        """
+        unread = (
+            notifications.filter(is_read=False)
+            .order_by()
+            .values('user')
+            .annotate(count=Count('pk'))
+            .values_list('user', 'count')
+        )
+        owners_by_count = defaultdict(list)
+        for user_id, count in unread:
+            owners_by_count[count].append(user_id)
+
+        for count, user_ids in owners_by_count.items():
+            cls.adjust_unread_count(user_ids, -count)
+
     def mark_as_read(self):
         """Mark notification as read"""
         if not self.is_read:
             self.is_read = True
             self.read_at = timezone.now()
             self.save(update_fields=['is_read', 'read_at'])
+            self.adjust_unread_count([self.user_id], -1)
+
+    def mark_as_unread(self):
+        """Mark notification as unread"""
+        if self.is_read:
+            self.is_read = False
+            self.read_at = None
+            self.save(update_fields=['is_read', 'read_at'])
+            self.adjust_unread_count([self.user_id], 1)
+
+    @classmethod
+    def mark_all_as_read(cls, user):
+        """Mark all of a user's unread notifications as read in one UPDATE"""
+        with transaction.atomic():
+            updated = cls.objects.filter(user=user, is_read=False).update(
+                is_read=True,
+                read_at=timezone.now()
+            )
+            if updated:
+                cls.adjust_unread_count([user.pk], -updated)
+        return updated
 
     @classmethod
     def create_notification(cls, user, title, message, notification_type='info', **kwargs):
@@ -417,4 +753,35 @@ class UserNotification(BaseModel):
             message=message,
             notification_type=notification_type,
             **kwargs
-        )
\ No newline at end of file
+        )
+
+    @classmethod
+    def create_notifications_bulk(cls, users, title, message, notification_type='info', **kwargs):
+        """Create the same notification for many users (instances or IDs) with batched inserts"""
+        notifications = [
+            cls(
+                user_id=getattr(user, 'pk', user),
+                title=title,
+                message=message,
+                notification_type=notification_type,
+                **kwargs
+            )
+            for user in users
+        ]
+        return cls.bulk_insert(notifications)
+
+    @classmethod
+    def bulk_insert(cls, notifications):
+        """Insert notifications in batches and bump their owners' unread counters"""
+        with transaction.atomic():
+            created = cls.objects.bulk_create(notifications, batch_size=500)
+
+            # bulk_create skips save(); one counter UPDATE per distinct increment
+            unread_per_user = Counter(n.user_id for n in created if not n.is_read)
+            users_by_increment = defaultdict(list)
+            for user_id, increment in unread_per_user.items():
+                users_by_increment[increment].append(user_id)
+            for increment, user_ids in users_by_increment.items():
+                cls.adjust_unread_count(user_ids, increment)
+
+        return created
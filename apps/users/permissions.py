@@ -1,9 +1,66 @@
+from functools import lru_cache
+
+from allauth.account.models import EmailAddress
 from rest_framework import permissions
+from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Q
 
 User = get_user_model()
 
 
+@lru_cache(maxsize=1)
+def _get_role_model():
+    """teams.Role, resolved once instead of importing inside every check"""
+    return apps.get_model('teams', 'Role')
+
+
+@lru_cache(maxsize=1)
+def _get_membership_model():
+    """teams.OrganizationMember, resolved once instead of importing inside every check"""
+    return apps.get_model('teams', 'OrganizationMember')
+
+
+def _get_perm_cache(user):
+    """
+    Per-instance permission flags; request.user is rebuilt for every request
+
+    The first permission class to run loads every flag in one query, so
+    stacked permission classes don't each issue their own EXISTS.
+    """
+    cache = getattr(user, '_perm_cache', None)
+    if cache is None:
+        cache = user._perm_cache = _load_perm_flags(user)
+    return cache
+
+
+def _load_perm_flags(user):
+    """Evaluate all permission flags for a user in a single query"""
+    memberships = _get_membership_model().objects.filter(user=OuterRef('pk'), is_active=True)
+
+    flags = User.objects.filter(pk=user.pk).annotate(
+        is_member=Exists(memberships),
+        is_admin=Exists(memberships.filter(is_privileged=True)),
+        verified_email=Exists(EmailAddress.objects.filter(user=OuterRef('pk'), verified=True)),
+    ).values('is_member', 'is_admin', 'verified_email').first() or {}
+
+    # Share the result with the has_verified_email property
+    if not hasattr(user, '_has_verified_email'):
+        user._has_verified_email = flags.get('verified_email', False)
+
+    return flags
+
+
+def _user_has_admin_role(user):
+    """Whether the user is an owner or admin of any organization (memoized)"""
+    return _get_perm_cache(user).get('is_admin', False)
+
+
+def _user_is_org_member(user):
+    """Whether the user is an active member of any organization (memoized)"""
+    return _get_perm_cache(user).get('is_member', False)
+
+
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Permission that allows owners to edit, others to read only
@@ -15,10 +72,10 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         # Write permissions only for owner
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
-        elif hasattr(obj, 'owner'):
-            return obj.owner == request.user
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == request.user.id
+        elif hasattr(obj, 'owner_id'):
+            return obj.owner_id == request.user.id
         elif isinstance(obj, User):
             return obj == request.user
 
@@ -31,10 +88,10 @@ class IsOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        if hasattr(obj, 'user'):
-            return obj.user == request.user
-        elif hasattr(obj, 'owner'):
-            return obj.owner == request.user
+        if hasattr(obj, 'user_id'):
+            return obj.user_id == request.user.id
+        elif hasattr(obj, 'owner_id'):
+            return obj.owner_id == request.user.id
         elif isinstance(obj, User):
             return obj == request.user
 
@@ -55,18 +112,14 @@ class CanViewUserData(permissions.BasePermission):
         if obj == request.user:
             return True
 
-        # Check if users share any organizations
-        user_orgs = set(request.user.organization_memberships.filter(
-            is_active=True
-        ).values_list('organization_id', flat=True))
-
-        target_user_orgs = set(obj.organization_memberships.filter(
-            is_active=True
-        ).values_list('organization_id', flat=True))
-
-        # If they share any organizations, allow access
-        shared_orgs = user_orgs.intersection(target_user_orgs)
-        return bool(shared_orgs)
+        # Check if users share any organizations in a single EXISTS query
+        return request.user.organization_memberships.filter(
+            is_active=True,
+            organization_id__in=_get_membership_model().objects.filter(
+                user=obj,
+                is_active=True
+            ).values('organization_id')
+        ).exists()
 
 
 class CanManageUser(permissions.BasePermission):
@@ -84,34 +137,18 @@ class CanManageUser(permissions.BasePermission):
             return True
 
         # Check organization-level permissions
-        from apps.teams.models import Role
-
-        # Get shared organizations
-        user_memberships = request.user.organization_memberships.filter(
-            is_active=True
-        ).select_related('organization', 'role')
-
-        target_memberships = obj.organization_memberships.filter(
-            is_active=True
-        ).select_related('organization', 'role')
-
-        for user_membership in user_memberships:
-            # Check if target user is in the same organization
-            target_membership = target_memberships.filter(
-                organization=user_membership.organization
-            ).first()
-
-            if target_membership:
-                # Organization owners can manage anyone
-                if user_membership.role.name == Role.OWNER:
-                    return True
+        Role = _get_role_model()
 
-                # Admins can manage members and viewers (not other admins/owners)
-                if (user_membership.role.name == Role.ADMIN and
-                        target_membership.role.name in [Role.MEMBER, Role.VIEWER]):
-                    return True
-
-        return False
+        # A single filter() call so every organization__members condition
+        # applies to the same joined (target) membership row:
+        # owners can manage anyone, admins can manage members and viewers
+        return request.user.organization_memberships.filter(
+            Q(role__name=Role.OWNER) |
+            Q(role__name=Role.ADMIN, organization__members__role__name__in=[Role.MEMBER, Role.VIEWER]),
+            is_active=True,
+            organization__members__user=obj,
+            organization__members__is_active=True
+        ).exists()
 
 
 class IsAdminOrOwner(permissions.BasePermission):
@@ -128,13 +165,7 @@ class IsAdminOrOwner(permissions.BasePermission):
             return True
 
         # Check if user is owner or admin of any organization
-        from apps.teams.models import Role
-
-        user_roles = request.user.organization_memberships.filter(
-            is_active=True
-        ).values_list('role__name', flat=True)
-
-        return any(role in [Role.OWNER, Role.ADMIN] for role in user_roles)
+        return _user_has_admin_role(request.user)
 
 
 class IsUserOrSuperuser(permissions.BasePermission):
@@ -153,8 +184,8 @@ class IsUserOrSuperuser(permissions.BasePermission):
         # Users can access their own data
         if isinstance(obj, User):
             return obj == request.user
-        elif hasattr(obj, 'user'):
-            return obj.user == request.user
+        elif hasattr(obj, 'user_id'):
+            return obj.user_id == request.user.id
 
         return False
 
@@ -170,13 +201,7 @@ class CanCreateNotification(permissions.BasePermission):
             return False
 
         # Check if user has admin privileges in any organization
-        from apps.teams.models import Role
-
-        admin_roles = [Role.OWNER, Role.ADMIN]
-        return request.user.organization_memberships.filter(
-            is_active=True,
-            role__name__in=admin_roles
-        ).exists()
+        return _user_has_admin_role(request.user)
 
 
 class CanAccessUserSession(permissions.BasePermission):
@@ -186,7 +211,7 @@ class CanAccessUserSession(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
 
 class CanAccessUserActivity(permissions.BasePermission):
@@ -196,7 +221,7 @@ class CanAccessUserActivity(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return obj.user == request.user
+        return obj.user_id == request.user.id
 
 
 class IsVerifiedUser(permissions.BasePermission):
@@ -208,6 +233,7 @@ class IsVerifiedUser(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
+        _get_perm_cache(request.user)
         return request.user.has_verified_email
 
 
@@ -233,14 +259,8 @@ class CanInviteUsers(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        from apps.teams.models import Role
-
         # Check if user has invite permissions in any organization
-        invite_roles = [Role.OWNER, Role.ADMIN]
-        return request.user.organization_memberships.filter(
-            is_active=True,
-            role__name__in=invite_roles
-        ).exists()
+        return _user_has_admin_role(request.user)
 
 
 class RateLimitPermission(permissions.BasePermission):
@@ -273,6 +293,4 @@ class OrganizationMemberPermission(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        return request.user.organization_memberships.filter(
-            is_active=True
-        ).exists()
\ No newline at end of file
+        return _user_is_org_member(request.user)
\ No newline at end of file
@@ -1,10 +1,15 @@
+from zoneinfo import available_timezones
+
 from rest_framework import serializers
-from django.contrib.auth import get_user_model
+from django.contrib.auth import get_user_model, update_session_auth_hash
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from django.utils import timezone
 from allauth.account.models import EmailAddress
 
+from apps.teams.serializers import OrganizationSerializer, RoleSerializer
+from apps.utils.serializers import CachedModelSerializer
 from .models import (
     UserPreference,
     UserActivity,
@@ -14,8 +19,42 @@ from .models import (
 
 User = get_user_model()
 
+# IANA zone names accepted by the onboarding timezone field
+VALID_TIMEZONES = frozenset(available_timezones())
+
+
+def _serializer_now(serializer):
+    """Current time, taken once per serializer tree (or from context['now'])"""
+    now = serializer.context.get('now')
+    if now is None:
+        now = serializer.context['now'] = timezone.now()
+    return now
+
+
+def _format_time_ago(seconds):
+    """Format an age in seconds as a short human-readable string"""
+    if seconds < 60:
+        return "Just now"
+    if seconds < 3600:
+        minutes = seconds // 60
+        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+    if seconds < 86400:
+        hours = seconds // 3600
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    days = seconds // 86400
+    return f"{days} day{'s' if days > 1 else ''} ago"
+
+
+class MetadataField(serializers.JSONField):
+    """
+    JSON field that renders NULL metadata as an empty object
+    """
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance) or {}
 
-class UserProfileSerializer(serializers.ModelSerializer):
+
+class UserProfileSerializer(CachedModelSerializer):
     """
     Serializer for user profile information
     """
@@ -42,20 +81,33 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'total_organizations', 'owned_organizations_count'
         ]
 
+    def update(self, instance, validated_data):
+        """Write only the submitted fields, leaving the counters to their F() updates"""
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
     def validate_phone(self, value):
         """Validate phone number format"""
-        if value and len(value.strip()) < 10:
+        if not value:
+            return value
+        value = value.strip()
+        if len(value) < 10:
             raise serializers.ValidationError("Phone number must be at least 10 digits.")
-        return value.strip() if value else value
+        return value
 
     def validate_bio(self, value):
         """Validate bio length"""
-        if value and len(value.strip()) > 500:
+        if not value:
+            return value
+        value = value.strip()
+        if len(value) > 500:
             raise serializers.ValidationError("Bio cannot exceed 500 characters.")
-        return value.strip() if value else value
+        return value
 
 
-class UserBasicSerializer(serializers.ModelSerializer):
+class UserBasicSerializer(CachedModelSerializer):
     """
     Basic user serializer for nested usage
     """
@@ -70,13 +122,22 @@ class UserBasicSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class PrimaryOrganizationSerializer(serializers.Serializer):
+    """
+    Minimal organization summary nested in user details
+    """
+    id = serializers.IntegerField(read_only=True)
+    name = serializers.CharField(read_only=True)
+    slug = serializers.CharField(read_only=True)
+
+
 class UserDetailSerializer(UserProfileSerializer):
     """
     Detailed user serializer with additional information
     """
     primary_organization = serializers.SerializerMethodField()
     recent_activity = serializers.SerializerMethodField()
-    unread_notifications_count = serializers.SerializerMethodField()
+    unread_notifications_count = serializers.ReadOnlyField()
 
     class Meta(UserProfileSerializer.Meta):
         fields = UserProfileSerializer.Meta.fields + [
@@ -91,21 +152,20 @@ class UserDetailSerializer(UserProfileSerializer):
         """Get user's primary organization"""
         primary_org = obj.get_primary_organization()
         if primary_org:
-            from apps.teams.serializers import OrganizationSerializer
-            return OrganizationSerializer(primary_org, context=self.context).data
+            # Only the summary fields: the full OrganizationSerializer costs
+            # owner, member/API key count and role queries per user
+            return PrimaryOrganizationSerializer(primary_org).data
         return None
 
     def get_recent_activity(self, obj):
-        """Get user's recent activities"""
-        activities = obj.activities.all()[:5]
+        """Get user's recent activities (uses with_recent_activities() if present)"""
+        activities = getattr(obj, 'recent_activities_cached', None)
+        if activities is None:
+            activities = obj.activities.select_related('organization').order_by('-created_at')[:5]
         return UserActivitySerializer(activities, many=True).data
 
-    def get_unread_notifications_count(self, obj):
-        """Get count of unread notifications"""
-        return obj.notifications.filter(is_read=False).count()
 
-
-class UserPreferenceSerializer(serializers.ModelSerializer):
+class UserPreferenceSerializer(CachedModelSerializer):
     """
     Serializer for user preferences
     """
@@ -134,47 +194,38 @@ class UserPreferenceSerializer(serializers.ModelSerializer):
         return value
 
 
-class UserActivitySerializer(serializers.ModelSerializer):
+class UserActivitySerializer(CachedModelSerializer):
     """
     Serializer for user activities
     """
     action_display = serializers.CharField(source='get_action_display', read_only=True)
     organization_name = serializers.CharField(source='organization.name', read_only=True)
+    metadata = MetadataField(read_only=True)
     time_ago = serializers.SerializerMethodField()
 
     class Meta:
         model = UserActivity
         fields = [
             'id', 'action', 'action_display', 'description',
-            'organization', 'organization_name', 'metadata',
+            'organization', 'organization_name', 'endpoint', 'method',
+            'status_code', 'response_time_ms', 'metadata',
             'created_at', 'time_ago'
         ]
         read_only_fields = fields
 
     def get_time_ago(self, obj):
         """Get human-readable time difference"""
-        now = timezone.now()
-        diff = now - obj.created_at
-
-        if diff.days > 0:
-            return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hour{'s' if hours > 1 else ''} ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-        else:
-            return "Just now"
-
-
-class UserSessionSerializer(serializers.ModelSerializer):
+        return _format_time_ago(int((_serializer_now(self) - obj.created_at).total_seconds()))
+
+
+class UserSessionSerializer(CachedModelSerializer):
     """
     Serializer for user sessions
     """
+    user_agent = serializers.CharField(source='user_agent.raw', default='', read_only=True)
     is_current = serializers.SerializerMethodField()
     is_expired = serializers.ReadOnlyField()
-    browser_info = serializers.SerializerMethodField()
+    browser_info = serializers.ReadOnlyField()
 
     class Meta:
         model = UserSession
@@ -188,42 +239,22 @@ class UserSessionSerializer(serializers.ModelSerializer):
 
     def get_is_current(self, obj):
         """Check if this is the current session"""
-        request = self.context.get('request')
-        if request and hasattr(request, 'session'):
-            return request.session.session_key == obj.session_key
-        return False
-
-    def get_browser_info(self, obj):
-        """Extract browser information from user agent"""
-        user_agent = obj.user_agent.lower()
-
-        if 'chrome' in user_agent:
-            browser = 'Chrome'
-        elif 'firefox' in user_agent:
-            browser = 'Firefox'
-        elif 'safari' in user_agent:
-            browser = 'Safari'
-        elif 'edge' in user_agent:
-            browser = 'Edge'
-        else:
-            browser = 'Unknown'
-
-        if 'mobile' in user_agent:
-            device = 'Mobile'
-        elif 'tablet' in user_agent:
-            device = 'Tablet'
-        else:
-            device = 'Desktop'
-
-        return f"{browser} on {device}"
-
-
-class UserNotificationSerializer(serializers.ModelSerializer):
+        # Resolve the current key once per serializer tree (or take it from the view)
+        if 'current_session_key' not in self.context:
+            request = self.context.get('request')
+            self.context['current_session_key'] = (
+                request.session.session_key if request and hasattr(request, 'session') else None
+            )
+        return obj.session_key == self.context['current_session_key']
+
+
+class UserNotificationSerializer(CachedModelSerializer):
     """
     Serializer for user notifications
     """
     type_display = serializers.CharField(source='get_notification_type_display', read_only=True)
     organization_name = serializers.CharField(source='organization.name', read_only=True)
+    metadata = MetadataField(required=False, allow_null=True)
     time_ago = serializers.SerializerMethodField()
 
     class Meta:
@@ -240,19 +271,7 @@ class UserNotificationSerializer(serializers.ModelSerializer):
 
     def get_time_ago(self, obj):
         """Get human-readable time difference"""
-        now = timezone.now()
-        diff = now - obj.created_at
-
-        if diff.days > 0:
-            return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hour{'s' if hours > 1 else ''} ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-        else:
-            return "Just now"
+        return _format_time_ago(int((_serializer_now(self) - obj.created_at).total_seconds()))
 
 
 class PasswordChangeSerializer(serializers.Serializer):
@@ -290,9 +309,14 @@ class PasswordChangeSerializer(serializers.Serializer):
 
     def save(self):
         """Change user's password"""
-        user = self.context['request'].user
+        request = self.context['request']
+        user = request.user
         user.set_password(self.validated_data['new_password'])
-        user.save(update_fields=['password'])
+
+        with transaction.atomic():
+            user.save(update_fields=['password'])
+            # Rotate the session hash so the current session stays logged in
+            update_session_auth_hash(request, user)
         return user
 
 
@@ -300,20 +324,11 @@ class UserOrganizationSerializer(serializers.Serializer):
     """
     Serializer for user's organization memberships
     """
-    organization = serializers.SerializerMethodField()
-    role = serializers.SerializerMethodField()
+    # Nested once per serializer tree instead of a new serializer per membership
+    organization = OrganizationSerializer(read_only=True)
+    role = RoleSerializer(read_only=True)
     membership_info = serializers.SerializerMethodField()
 
-    def get_organization(self, obj):
-        """Get organization details"""
-        from apps.teams.serializers import OrganizationSerializer
-        return OrganizationSerializer(obj.organization, context=self.context).data
-
-    def get_role(self, obj):
-        """Get role details"""
-        from apps.teams.serializers import RoleSerializer
-        return RoleSerializer(obj.role).data
-
     def get_membership_info(self, obj):
         """Get membership information"""
         return {
@@ -337,14 +352,13 @@ class BulkNotificationActionSerializer(serializers.Serializer):
     def validate_notification_ids(self, value):
         """Validate that notification IDs exist and belong to user"""
         user = self.context['request'].user
-        existing_ids = set(
-            user.notifications.filter(id__in=value).values_list('id', flat=True)
-        )
+        unique_ids = list(dict.fromkeys(value))
 
-        if len(existing_ids) != len(value):
+        # Let the database count the matches instead of fetching the IDs back
+        if user.notifications.filter(id__in=unique_ids).count() != len(unique_ids):
             raise serializers.ValidationError("Some notification IDs are invalid or don't belong to you.")
 
-        return value
+        return unique_ids
 
 
 class UserStatsSerializer(serializers.Serializer):
@@ -372,8 +386,7 @@ class UserOnboardingSerializer(serializers.Serializer):
 
     def validate_timezone(self, value):
         """Validate timezone"""
-        import pytz
-        if value and value not in pytz.all_timezones:
+        if value and value not in VALID_TIMEZONES:
             raise serializers.ValidationError("Invalid timezone.")
         return value
 
@@ -385,10 +398,11 @@ class UserOnboardingSerializer(serializers.Serializer):
             setattr(user, attr, value)
 
         user.is_onboarded = True
-        user.save()
+        # Write only the onboarding columns, not the whole row
+        user.save(update_fields=[*self.validated_data, 'is_onboarded'])
 
-        # Create user preferences
-        UserPreference.objects.get_or_create(user=user)
+        # Create user preferences if the signup signal didn't; skips get_or_create's SELECT
+        UserPreference.objects.bulk_create([UserPreference(user=user)], ignore_conflicts=True)
 
         # Log onboarding completion
         UserActivity.objects.create(
@@ -1,38 +1,40 @@
-from django.db.models.signals import post_save, post_delete
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import transaction
 from django.utils import timezone
 from allauth.account.signals import email_confirmed
 
-from .models import (
-    UserPreference,
-    UserActivity,
-    UserSession,
-    UserNotification
-)
+from . import activity_buffer
+from .utils import get_client_ip as request_client_ip
 
 User = get_user_model()
 
+# Actions counted towards the suspicious activity alert
+SUSPICIOUS_ACTIONS = ('password_change', 'email_change', 'multiple_failed_logins')
+
+# Window (seconds) and count of suspicious actions that trigger the alert
+SUSPICIOUS_ACTIVITY_WINDOW = 3600
+SUSPICIOUS_ACTIVITY_THRESHOLD = 3
+
 
 @receiver(post_save, sender=User)
 def create_user_preferences(sender, instance, created, **kwargs):
     """
     Create user preferences when a new user is created
     """
+    UserPreference = apps.get_model('users', 'UserPreference')
+
     if created:
         UserPreference.objects.create(user=instance)
 
-        # Create welcome notification
-        UserNotification.create_notification(
-            user=instance,
-            title="Welcome to Billmunshi!",
-            message="Welcome to Billmunshi! Complete your profile to get started.",
-            notification_type='info',
-            action_url="/users/profile/",
-            action_text="Complete Profile"
-        )
+        # Create the welcome notification outside the signup transaction
+        from .tasks import create_welcome_notification
+        user_id = instance.id
+        transaction.on_commit(lambda: create_welcome_notification.delay(user_id))
 
 
 @receiver(email_confirmed)
@@ -40,6 +42,9 @@ def mark_user_as_verified(sender, request, email_address, **kwargs):
     """
     Mark user as verified when email is confirmed
     """
+    UserActivity = apps.get_model('users', 'UserActivity')
+    UserNotification = apps.get_model('users', 'UserNotification')
+
     user = email_address.user
     if not user.is_verified:
         user.is_verified = True
@@ -67,15 +72,20 @@ def user_login_handler(sender, request, user, **kwargs):
     """
     Handle user login activities
     """
+    UserAgent = apps.get_model('users', 'UserAgent')
+    UserSession = apps.get_model('users', 'UserSession')
+
     ip_address = get_client_ip(request)
     user_agent = request.META.get('HTTP_USER_AGENT', '')
 
-    # Update user's last activity
-    user.update_last_activity(ip_address)
+    # Last-seen and the login activity are written in batches by
+    # flush_activity_buffer so the login response doesn't wait on them.
+    # Login and logout are never inspected by the UserActivity signal handlers.
+    activity_buffer.touch_last_activity(user.id, ip_address)
 
     # Log login activity
-    UserActivity.objects.create(
-        user=user,
+    activity_buffer.enqueue(
+        user_id=user.id,
         action='login',
         description='User logged in successfully',
         ip_address=ip_address,
@@ -91,12 +101,14 @@ def user_login_handler(sender, request, user, **kwargs):
                 seconds=request.session.get_expiry_age()
             )
 
+            # Written here rather than buffered: the tracking middleware
+            # creates the row itself on the next request if it is missing
             UserSession.objects.update_or_create(
                 session_key=session_key,
                 defaults={
                     'user': user,
                     'ip_address': ip_address,
-                    'user_agent': user_agent,
+                    'user_agent_id': UserAgent.intern(user_agent),
                     'is_active': True,
                     'expires_at': expires_at,
                     'last_activity': timezone.now()
@@ -109,85 +121,105 @@ def user_logout_handler(sender, request, user, **kwargs):
     """
     Handle user logout activities
     """
-    if user:  # user might be None for anonymous sessions
-        ip_address = get_client_ip(request)
+    UserSession = apps.get_model('users', 'UserSession')
 
-        # Log logout activity
-        UserActivity.objects.create(
-            user=user,
+    if user:  # user might be None for anonymous sessions
+        # Log logout activity; written in batches by flush_activity_buffer
+        activity_buffer.enqueue(
+            user_id=user.id,
             action='logout',
             description='User logged out',
-            ip_address=ip_address,
+            ip_address=get_client_ip(request),
             user_agent=request.META.get('HTTP_USER_AGENT', '')
         )
 
-        # Deactivate session
+        # Deactivate session with a single UPDATE
         if hasattr(request, 'session') and request.session.session_key:
-            try:
-                user_session = UserSession.objects.get(
-                    session_key=request.session.session_key,
-                    user=user
-                )
-                user_session.terminate()
-            except UserSession.DoesNotExist:
-                pass
+            UserSession.objects.filter(
+                session_key=request.session.session_key,
+                user=user,
+                is_active=True
+            ).update(is_active=False)
 
 
-@receiver(post_delete, sender=Session)
+@receiver(post_delete, sender='sessions.Session')
 def cleanup_user_session(sender, instance, **kwargs):
     """
     Clean up UserSession when Django session is deleted
     """
-    try:
-        user_session = UserSession.objects.get(session_key=instance.session_key)
-        user_session.terminate()
-    except UserSession.DoesNotExist:
-        pass
+    UserSession = apps.get_model('users', 'UserSession')
+
+    UserSession.objects.filter(
+        session_key=instance.session_key,
+        is_active=True
+    ).update(is_active=False)
 
 
-@receiver(post_save, sender=UserActivity)
+@receiver(pre_delete, sender='teams.Organization')
+def release_organization_unread_notifications(sender, instance, **kwargs):
+    """
+    Lower members' unread counters for the notifications an organization delete cascades to
+
+    Runs inside the delete transaction, before the cascade removes the rows.
+    User deletes need nothing: the counter goes with the user row.
+    """
+    UserNotification = apps.get_model('users', 'UserNotification')
+
+    UserNotification.decrement_unread_counts(
+        UserNotification.objects.filter(organization=instance)
+    )
+
+
+@receiver(post_save, sender='users.UserActivity')
+def invalidate_security_score_cache(sender, instance, created, **kwargs):
+    """
+    Drop the cached password-change check when the user changes their password
+    """
+    from .utils import SECURITY_SCORE_PASSWORD_KEY
+
+    if created and instance.action == 'password_change':
+        cache.delete(SECURITY_SCORE_PASSWORD_KEY.format(user_id=instance.user_id))
+
+
+@receiver(post_save, sender='users.UserActivity')
 def check_suspicious_activity(sender, instance, created, **kwargs):
     """
     Check for suspicious activities and create notifications
     """
-    if not created:
-        return
+    UserNotification = apps.get_model('users', 'UserNotification')
 
-    user = instance.user
-    suspicious_actions = ['password_change', 'email_change', 'multiple_failed_logins']
+    if not created or instance.action not in SUSPICIOUS_ACTIONS:
+        return
 
-    if instance.action in suspicious_actions:
-        # Check for multiple suspicious activities in short time
-        recent_suspicious = UserActivity.objects.filter(
-            user=user,
-            action__in=suspicious_actions,
-            created_at__gte=timezone.now() - timezone.timedelta(hours=1)
-        ).count()
+    # Count suspicious actions in a cache counter that expires with the window
+    # instead of running a COUNT over the user's activities
+    key = f"susp:{instance.user_id}"
+    cache.add(key, 0, SUSPICIOUS_ACTIVITY_WINDOW)
+    try:
+        recent_suspicious = cache.incr(key)
+    except ValueError:
+        # Counter expired between add() and incr()
+        cache.set(key, 1, SUSPICIOUS_ACTIVITY_WINDOW)
+        recent_suspicious = 1
 
-        if recent_suspicious >= 3:
-            UserNotification.create_notification(
-                user=user,
-                title="Suspicious Activity Detected",
-                message="We've detected unusual activity on your account. Please review your recent activities.",
-                notification_type='security',
-                action_url="/users/activities/",
-                action_text="Review Activities"
-            )
+    if recent_suspicious >= SUSPICIOUS_ACTIVITY_THRESHOLD:
+        UserNotification.create_notification(
+            user=instance.user,
+            title="Suspicious Activity Detected",
+            message="We've detected unusual activity on your account. Please review your recent activities.",
+            notification_type='security',
+            action_url="/users/activities/",
+            action_text="Review Activities"
+        )
 
 
 def get_client_ip(request):
     """
-    Get client IP address from request
+    Get client IP address from request, parsed once per request
     """
     if not request:
         return None
-
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    return request_client_ip(request)
 
 
 # Organization-related signals for user notifications
@@ -196,6 +228,8 @@ def notify_user_organization_join(sender, instance, created, **kwargs):
     """
     Notify user when they join an organization
     """
+    UserNotification = apps.get_model('users', 'UserNotification')
+
     if created and instance.is_active:
         UserNotification.create_notification(
             user=instance.user,
@@ -214,21 +248,23 @@ def notify_user_invitation_received(sender, instance, created, **kwargs):
     Notify user when they receive an invitation
     """
     if created and instance.status == 'pending':
-        # Try to find existing user
-        try:
-            user = User.objects.get(email=instance.email)
-            UserNotification.create_notification(
-                user=user,
-                title=f"Invitation to {instance.organization.name}",
-                message=f"{instance.invited_by.get_display_name()} invited you to join {instance.organization.name} as {instance.role.get_name_display()}.",
-                notification_type='invitation',
-                organization=instance.organization,
-                action_url=f"/invitations/{instance.token}/",
-                action_text="View Invitation"
-            )
-        except User.DoesNotExist:
-            # User doesn't exist yet, notification will be created when they sign up
-            pass
+        # Only the existing user's ID is needed
+        user_id = User.objects.filter(email=instance.email).values_list('id', flat=True).first()
+
+        # User doesn't exist yet, notification will be created when they sign up
+        if user_id is None:
+            return
+
+        # Bulk invites arrive as many single saves; batch the inserts
+        activity_buffer.enqueue_notification(
+            user_id,
+            f"Invitation to {instance.organization.name}",
+            f"{instance.invited_by.get_display_name()} invited you to join {instance.organization.name} as {instance.role.get_name_display()}.",
+            notification_type='invitation',
+            organization_id=instance.organization_id,
+            action_url=f"/invitations/{instance.token}/",
+            action_text="View Invitation"
+        )
 
 
 @receiver(post_save, sender='teams.OrganizationAPIKey')
@@ -236,6 +272,9 @@ def notify_api_key_created(sender, instance, created, **kwargs):
     """
     Notify relevant users when API key is created
     """
+    UserActivity = apps.get_model('users', 'UserActivity')
+    UserNotification = apps.get_model('users', 'UserNotification')
+
     if created:
         # Notify the creator
         UserNotification.create_notification(
@@ -263,60 +302,19 @@ def notify_api_key_deleted(sender, instance, **kwargs):
     """
     Notify when API key is deleted
     """
-    # Create notification for organization members with API key management permissions
-    from apps.teams.models import Role
+    UserNotification = apps.get_model('users', 'UserNotification')
 
+    # Notify organization members with API key management permissions in one batched insert
     members_to_notify = instance.organization.members.filter(
         is_active=True,
         role__can_manage_api_keys=True
-    ).exclude(user=instance.created_by)
-
-    for member in members_to_notify:
-        UserNotification.create_notification(
-            user=member.user,
-            title="API Key Deleted",
-            message=f"API key '{instance.name}' was deleted from {instance.organization.name}.",
-            notification_type='api',
-            organization=instance.organization
-        )
-
-
-# Cleanup old activities and sessions periodically
-# This would typically be done with a Celery task, but for demonstration:
-@receiver(post_save, sender=UserActivity)
-def cleanup_old_activities(sender, **kwargs):
-    """
-    Clean up old activities (keep last 1000 per user)
-    """
-    # This is a simple implementation - in production, use Celery tasks
-    import random
-
-    # Only run cleanup 1% of the time to avoid performance issues
-    if random.randint(1, 100) == 1:
-        from django.db import connection
-
-        # Keep only the latest 1000 activities per user
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                           DELETE
-                           FROM user_activities
-                           WHERE id NOT IN (SELECT id
-                                            FROM (SELECT id
-                                                  FROM user_activities
-                                                  ORDER BY user_id, created_at DESC LIMIT 1000) AS subquery)
-                           """)
-
-
-@receiver(post_save, sender=UserSession)
-def cleanup_expired_sessions(sender, **kwargs):
-    """
-    Clean up expired sessions
-    """
-    import random
+    ).exclude(user=instance.created_by).select_related('user')
+
+    UserNotification.create_notifications_bulk(
+        users=[member.user for member in members_to_notify],
+        title="API Key Deleted",
+        message=f"API key '{instance.name}' was deleted from {instance.organization.name}.",
+        notification_type='api',
+        organization=instance.organization
+    )
 
-    # Only run cleanup 5% of the time
-    if random.randint(1, 20) == 1:
-        expired_sessions = UserSession.objects.filter(
-            expires_at__lt=timezone.now()
-        )
-        expired_sessions.update(is_active=False)
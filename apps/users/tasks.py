@@ -1,74 +1,272 @@
-from celery import shared_task
+from celery import group, shared_task
+from celery.signals import task_failure, task_retry, worker_init
+from celery.utils.time import get_exponential_backoff_interval
 from django.utils import timezone
 from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.db import OperationalError
+from django.template.loader import get_template
 from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
 from datetime import timedelta
+from functools import lru_cache
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+User = get_user_model()
+
+# Site details included in every user email
+SITE_NAME = getattr(settings, 'PROJECT_METADATA', {}).get('NAME', 'Billmunshi')
+SITE_URL = getattr(settings, 'FRONTEND_ADDRESS', 'http://localhost:3000')
+
+# Subject and template for each security alert type
+SECURITY_ALERT_TEMPLATES = {
+    'login_from_new_device': {
+        'subject': 'New device login detected',
+        'template': 'security_alert_new_device'
+    },
+    'password_changed': {
+        'subject': 'Password changed successfully',
+        'template': 'security_alert_password_change'
+    },
+    'suspicious_activity': {
+        'subject': 'Suspicious activity detected',
+        'template': 'security_alert_suspicious'
+    },
+    'api_key_created': {
+        'subject': 'New API key created',
+        'template': 'security_alert_api_key'
+    }
+}
+
+# User columns read when building digest emails (see _user_payload)
+DIGEST_USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+
+# Recipients streamed (and digests published) per chunk by send_digest_emails
+DIGEST_CHUNK_SIZE = 2000
+
+# Seconds between the countdowns of consecutive digest emails
+DIGEST_DISPATCH_STEP = 0.02
+
+# Errors worth retrying: network and SMTP failures (smtplib.SMTPException
+# and ConnectionError are OSErrors) and lost or busy database connections
+TRANSIENT_ERRORS = (OSError, OperationalError)
+
+# Retry policy for tasks that talk to SMTP or may race other writers:
+# exponential backoff from 60s up to 10 minutes, with jitter. Anything else
+# (missing user or template, integrity errors) fails at once
+RETRY_POLICY = {
+    'autoretry_for': TRANSIENT_ERRORS,
+    'retry_backoff': 60,
+    'retry_backoff_max': 600,
+    'retry_jitter': True,
+    'max_retries': 3,
+}
+
+# Recipients per send_bulk_notification_emails task
+BULK_EMAIL_CHUNK_SIZE = 50
+
+SESSION_CLEANUP_BATCH_SIZE = 10000
+
+# Rows removed per DELETE statement by the cleanup tasks and cleanup_user_data
+CLEANUP_DELETE_BATCH_SIZE = 10000
+
+# Write buffer for data export files; json.dump emits many small chunks
+EXPORT_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Repeat export requests within this many seconds reuse the last export file
+EXPORT_REUSE_SECONDS = 60 * 60
+
+# Upper bound on how long one export may hold the per-user in-flight lock
+EXPORT_LOCK_SECONDS = 15 * 60
+
+
+@task_retry.connect
+def log_task_retry(sender=None, request=None, reason=None, **kwargs):
+    """Log retries of the tasks in this module"""
+    if request is not None and request.task.startswith(__name__):
+        logger.warning(f"Task {request.task} failed, retrying: {reason}")
+
+
+@task_failure.connect
+def log_task_failure(sender=None, exception=None, **kwargs):
+    """Log RETRY_POLICY tasks in this module that ran out of retries"""
+    # The other tasks log their own failures before re-raising
+    if sender is not None and sender.name.startswith(__name__) and getattr(sender, 'autoretry_for', None):
+        logger.error(f"Task {sender.name} failed: {str(exception)}")
+
+
+@lru_cache(maxsize=None)
+def _email_template(path):
+    """Load and compile an email template once per worker process"""
+    return get_template(path)
+
+
+@lru_cache(maxsize=None)
+def _exports_dir():
+    """Data export directory, created on first use in each worker process"""
+    path = os.path.join(settings.MEDIA_ROOT, 'exports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@worker_init.connect
+def precompile_security_alert_templates(**kwargs):
+    """Compile the security alert templates when a worker starts"""
+    # Templates can't be loaded at import time, before the app registry is ready.
+    # worker_init is sent for every pool (worker_process_init only for prefork
+    # and solo, not the threads pool of the mail queue); prefork children
+    # inherit the compiled templates when they fork
+    for template_config in SECURITY_ALERT_TEMPLATES.values():
+        for extension in ('txt', 'html'):
+            try:
+                _email_template(f"users/emails/{template_config['template']}.{extension}")
+            except Exception as exc:
+                logger.warning(f"Could not precompile security alert template: {str(exc)}")
+
+
+def _digest_entry(notification):
+    """Plain dict of the notification fields rendered in digest emails"""
+    return {
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': notification.notification_type,
+        'action_url': notification.action_url,
+        'action_text': notification.action_text,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def _user_payload(user):
+    """JSON-safe stand-in for a user in email templates"""
+    return {
+        'id': user.id,
+        'email': user.email,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'get_display_name': user.get_display_name(),
+        'get_short_name': user.get_short_name(),
+    }
+
+
+def _render_email(template_name, context):
+    """Render the (text, html) bodies of a users/emails template"""
+    return (
+        _email_template(f'users/emails/{template_name}.txt').render(context),
+        _email_template(f'users/emails/{template_name}.html').render(context),
+    )
+
+# Most recent activities kept for each user by cleanup_old_activities, whatever their age
+ACTIVITIES_KEPT_PER_USER = 1000
+
 
-@shared_task(bind=True, max_retries=3)
-def send_email_async(self, subject, message, from_email, recipient_list, html_message=None):
+@shared_task(**RETRY_POLICY)
+def send_email_async(subject, message, from_email, recipient_list, html_message=None):
     """
     Send email asynchronously
     """
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=from_email,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False
-        )
-        logger.info(f"Email sent successfully to {recipient_list}")
-        return f"Email sent to {len(recipient_list)} recipients"
-    except Exception as exc:
-        logger.error(f"Failed to send email: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
-
-
-@shared_task(bind=True, max_retries=3)
-def send_user_notification_email(self, user_id, template_name, context=None, subject=None):
+    send_mail(
+        subject=subject,
+        message=message,
+        from_email=from_email,
+        recipient_list=recipient_list,
+        html_message=html_message,
+        fail_silently=False
+    )
+    logger.info(f"Email sent successfully to {recipient_list}")
+    return f"Email sent to {len(recipient_list)} recipients"
+
+
+@shared_task(**RETRY_POLICY)
+def send_user_notification_email(user_id, template_name, context=None, subject=None, user_payload=None):
     """
     Send notification email to user
+
+    Callers that already hold the user can pass ``user_payload`` (see
+    _user_payload) so the task doesn't fetch the user again.
     """
-    try:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
+    user = user_payload if user_payload is not None else User.objects.get(id=user_id)
+    email = user['email'] if user_payload is not None else user.email
+    context = context or {}
+    context.update({
+        'user': user,
+        'site_name': SITE_NAME,
+        'site_url': SITE_URL
+    })
+
+    # Render email templates
+    text_message, html_message = _render_email(template_name, context)
+
+    if not subject:
+        subject = f"Notification from {context['site_name']}"
+
+    send_mail(
+        subject=subject,
+        message=text_message,
+        html_message=html_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[email],
+        fail_silently=False
+    )
+
+    logger.info(f"Notification email sent to user {email}")
+    return f"Notification email sent to {email}"
+
+
+@shared_task(bind=True, max_retries=RETRY_POLICY['max_retries'])
+def send_bulk_notification_emails(self, user_ids, template_name, context=None, subject=None):
+    """
+    Send the same notification email to a chunk of users over one mail connection
 
-        user = User.objects.get(id=user_id)
-        context = context or {}
-        context.update({
-            'user': user,
-            'site_name': getattr(settings, 'PROJECT_METADATA', {}).get('NAME', 'Billmunshi'),
-            'site_url': getattr(settings, 'FRONTEND_ADDRESS', 'http://localhost:3000')
-        })
-
-        # Render email templates
-        html_message = render_to_string(f'users/emails/{template_name}.html', context)
-        text_message = render_to_string(f'users/emails/{template_name}.txt', context)
-
-        if not subject:
-            subject = f"Notification from {context['site_name']}"
-
-        send_mail(
-            subject=subject,
-            message=text_message,
-            html_message=html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False
-        )
+    On a transient failure only the recipients that haven't been sent to yet
+    are retried, so nobody gets the email twice.
+    """
+    from django.core import mail
 
-        logger.info(f"Notification email sent to user {user.email}")
-        return f"Notification email sent to {user.email}"
+    base_context = {
+        **(context or {}),
+        'site_name': SITE_NAME,
+        'site_url': SITE_URL
+    }
+    if not subject:
+        subject = f"Notification from {base_context['site_name']}"
 
-    except Exception as exc:
-        logger.error(f"Failed to send notification email: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+    sent_ids = set()
+    try:
+        # One SMTP connection (and TLS handshake) for the whole chunk
+        with mail.get_connection(fail_silently=False) as connection:
+            for user in User.objects.filter(id__in=user_ids):
+                # Templates are rendered per user because they receive the user
+                text_message, html_message = _render_email(template_name, {**base_context, 'user': user})
+                message = mail.EmailMultiAlternatives(
+                    subject=subject,
+                    body=text_message,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[user.email]
+                )
+                message.attach_alternative(html_message, 'text/html')
+                connection.send_messages([message])
+                sent_ids.add(user.id)
+
+    except TRANSIENT_ERRORS as exc:
+        remaining_ids = [user_id for user_id in user_ids if user_id not in sent_ids]
+        countdown = get_exponential_backoff_interval(
+            factor=RETRY_POLICY['retry_backoff'],
+            retries=self.request.retries,
+            maximum=RETRY_POLICY['retry_backoff_max'],
+            full_jitter=RETRY_POLICY['retry_jitter']
+        )
+        raise self.retry(
+            args=(remaining_ids, template_name, context, subject),
+            exc=exc,
+            countdown=countdown
+        )
+
+    logger.info(f"Bulk notification email sent to {len(sent_ids)} users")
+    return f"Bulk notification email sent to {len(sent_ids)} users"
 
 
 @shared_task
@@ -80,15 +278,24 @@ def cleanup_expired_sessions():
     from django.contrib.sessions.models import Session
 
     try:
-        # Mark expired UserSessions as inactive
-        expired_count = UserSession.objects.filter(
-            expires_at__lt=timezone.now(),
-            is_active=True
-        ).update(is_active=False)
+        now = timezone.now()
+
+        # Mark expired UserSessions as inactive in bounded batches to keep locks short
+        expired_count = 0
+        while True:
+            expired_ids = list(
+                UserSession.objects.filter(
+                    expires_at__lt=now,
+                    is_active=True
+                ).values_list('id', flat=True)[:SESSION_CLEANUP_BATCH_SIZE]
+            )
+            if not expired_ids:
+                break
+            expired_count += UserSession.objects.filter(id__in=expired_ids).update(is_active=False)
 
         # Delete expired Django sessions
         django_expired_count, _ = Session.objects.filter(
-            expire_date__lt=timezone.now()
+            expire_date__lt=now
         ).delete()
 
         logger.info(f"Cleaned up {expired_count} user sessions and {django_expired_count} Django sessions")
@@ -99,32 +306,73 @@ def cleanup_expired_sessions():
         raise exc
 
 
-@shared_task
-def cleanup_old_activities(days=90):
+def _delete_ranked_activities(ranked_filter, params):
     """
-    Clean up old user activities (keep last N days)
+    Delete the user activities matching a filter over their per-user rank (rn)
+
+    ROW_NUMBER() ranks each user's rows once, into a temporary table of ids;
+    those are then deleted in id-ordered batches so no single statement holds
+    locks over the whole table and no batch re-ranks it.
     """
-    from .models import UserActivity
+    from django.db import connection
+
+    deleted_count = 0
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS activity_cleanup_ids")
+        cursor.execute(f"""
+                       CREATE TEMPORARY TABLE activity_cleanup_ids AS
+                       SELECT id
+                       FROM (SELECT id,
+                                    created_at,
+                                    ROW_NUMBER() OVER (
+                                        PARTITION BY user_id ORDER BY created_at DESC
+                                    ) AS rn
+                             FROM user_activities) AS ranked_activities
+                       WHERE {ranked_filter}
+                       """, params)
+        cursor.execute("ALTER TABLE activity_cleanup_ids ADD PRIMARY KEY (id)")
+
+        try:
+            # Keyset pagination over the ranked ids
+            last_id = None
+            while True:
+                if last_id is None:
+                    cursor.execute(
+                        "SELECT id FROM activity_cleanup_ids ORDER BY id LIMIT %s",
+                        [CLEANUP_DELETE_BATCH_SIZE]
+                    )
+                else:
+                    cursor.execute(
+                        "SELECT id FROM activity_cleanup_ids WHERE id > %s ORDER BY id LIMIT %s",
+                        [last_id, CLEANUP_DELETE_BATCH_SIZE]
+                    )
+                batch_ids = [row[0] for row in cursor.fetchall()]
+                if not batch_ids:
+                    break
 
-    try:
-        cutoff_date = timezone.now() - timedelta(days=days)
+                cursor.execute("DELETE FROM user_activities WHERE id = ANY(%s)", [batch_ids])
+                deleted_count += cursor.rowcount
+                last_id = batch_ids[-1]
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS activity_cleanup_ids")
 
-        # Delete old activities but keep the latest 100 per user
-        from django.db import connection
+    return deleted_count
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                           DELETE
-                           FROM user_activities
-                           WHERE created_at < %s
-                             AND id NOT IN (SELECT id
-                                            FROM (SELECT id
-                                                  FROM user_activities
-                                                  WHERE user_id = user_activities.user_id
-                                                  ORDER BY created_at DESC LIMIT 100) AS recent_activities)
-                           """, [cutoff_date])
 
-            deleted_count = cursor.rowcount
+@shared_task
+def cleanup_old_activities(days=90, keep=ACTIVITIES_KEPT_PER_USER):
+    """
+    Clean up old user activities (keep last N days) and cap each user's history
+    """
+    try:
+        cutoff_date = timezone.now() - timedelta(days=days)
+
+        # Delete old activities but keep the latest 100 per user, and never keep
+        # more than each user's latest `keep`; one ranking serves both rules
+        deleted_count = _delete_ranked_activities(
+            "rn > %s OR (rn > 100 AND created_at < %s)",
+            [keep, cutoff_date]
+        )
 
         logger.info(f"Cleaned up {deleted_count} old activities")
         return f"Cleaned up {deleted_count} old activities"
@@ -134,6 +382,63 @@ def cleanup_old_activities(days=90):
         raise exc
 
 
+@shared_task
+def flush_activity_buffer():
+    """
+    Write buffered user activities, notifications and last-seen timestamps in batches
+    """
+    from . import activity_buffer
+
+    try:
+        activities_written, notifications_written, users_touched = activity_buffer.flush()
+
+        summary = (
+            f"Flushed {activities_written} activities, {notifications_written} notifications "
+            f"and {users_touched} last-seen updates"
+        )
+        if activities_written or notifications_written or users_touched:
+            logger.info(summary)
+        return summary
+
+    except Exception as exc:
+        logger.error(f"Failed to flush activity buffer: {str(exc)}")
+        raise exc
+
+
+@shared_task(**RETRY_POLICY)
+def create_welcome_notification(user_id):
+    """
+    Create the welcome notification for a newly registered user
+    """
+    from .models import UserNotification
+
+    UserNotification.objects.create(
+        user_id=user_id,
+        title="Welcome to Billmunshi!",
+        message="Welcome to Billmunshi! Complete your profile to get started.",
+        notification_type='info',
+        action_url="/users/profile/",
+        action_text="Complete Profile"
+    )
+    return f"Welcome notification created for user {user_id}"
+
+
+def _raw_delete_in_batches(queryset):
+    """
+    Delete the queryset's rows with plain DELETE statements of bounded size
+
+    Skips delete signals and the collector, so only use it for models that
+    nothing references and that have no delete side effects.
+    """
+    model = queryset.model
+    deleted_count = 0
+    while True:
+        batch_ids = list(queryset.values_list('id', flat=True)[:CLEANUP_DELETE_BATCH_SIZE])
+        if not batch_ids:
+            return deleted_count
+        deleted_count += model.objects.filter(id__in=batch_ids)._raw_delete(queryset.db)
+
+
 @shared_task
 def cleanup_old_notifications(days=180):
     """
@@ -144,11 +449,14 @@ def cleanup_old_notifications(days=180):
     try:
         cutoff_date = timezone.now() - timedelta(days=days)
 
-        # Delete old read notifications
-        deleted_count, _ = UserNotification.objects.filter(
+        old_notifications = UserNotification.objects.filter(
             created_at__lt=cutoff_date,
             is_read=True
-        ).delete()
+        )
+
+        # Nothing references read notifications and they don't affect unread
+        # counters, so skip the deletion collector
+        deleted_count = _raw_delete_in_batches(old_notifications)
 
         logger.info(f"Cleaned up {deleted_count} old notifications")
         return f"Cleaned up {deleted_count} old notifications"
@@ -158,62 +466,37 @@ def cleanup_old_notifications(days=180):
         raise exc
 
 
-@shared_task(bind=True, max_retries=3)
-def send_security_alert_email(self, user_id, alert_type, details):
+@shared_task(**RETRY_POLICY)
+def send_security_alert_email(user_id, alert_type, details):
     """
     Send security alert email to user
     """
-    try:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
+    user = User.objects.get(id=user_id)
 
-        user = User.objects.get(id=user_id)
+    context = {
+        'user': user,
+        'site_name': SITE_NAME,
+        'site_url': SITE_URL,
+        **details
+    }
 
-        context = {
-            'user': user,
-            'site_name': getattr(settings, 'PROJECT_METADATA', {}).get('NAME', 'Billmunshi'),
-            'site_url': getattr(settings, 'FRONTEND_ADDRESS', 'http://localhost:3000'),
-            **details
-        }
+    template_config = SECURITY_ALERT_TEMPLATES.get(alert_type)
+    if not template_config:
+        raise ValueError(f"Unknown alert type: {alert_type}")
 
-        # Security alert templates
-        templates = {
-            'login_from_new_device': {
-                'subject': 'New device login detected',
-                'template': 'security_alert_new_device'
-            },
-            'password_changed': {
-                'subject': 'Password changed successfully',
-                'template': 'security_alert_password_change'
-            },
-            'suspicious_activity': {
-                'subject': 'Suspicious activity detected',
-                'template': 'security_alert_suspicious'
-            }
-        }
+    text_message, html_message = _render_email(template_config['template'], context)
 
-        template_config = templates.get(alert_type)
-        if not template_config:
-            raise ValueError(f"Unknown alert type: {alert_type}")
+    send_mail(
+        subject=template_config['subject'],
+        message=text_message,
+        html_message=html_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[user.email],
+        fail_silently=False
+    )
 
-        html_message = render_to_string(f'users/emails/{template_config["template"]}.html', context)
-        text_message = render_to_string(f'users/emails/{template_config["template"]}.txt', context)
-
-        send_mail(
-            subject=template_config['subject'],
-            message=text_message,
-            html_message=html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            fail_silently=False
-        )
-
-        logger.info(f"Security alert email sent to user {user.email}")
-        return f"Security alert sent to {user.email}"
-
-    except Exception as exc:
-        logger.error(f"Failed to send security alert: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+    logger.info(f"Security alert email sent to user {user.email}")
+    return f"Security alert sent to {user.email}"
 
 
 @shared_task
@@ -221,44 +504,55 @@ def process_user_data_export(user_id):
     """
     Process user data export request
     """
+    lock_key = f"export:lock:{user_id}"
+    file_key = f"export:file:{user_id}"
+
+    # Repeated clicks while an export is running don't start another one
+    if not cache.add(lock_key, 1, EXPORT_LOCK_SECONDS):
+        logger.info(f"User data export already in progress for user {user_id}")
+        return f"Data export already in progress for user {user_id}"
+
     try:
-        from django.contrib.auth import get_user_model
         from .utils import export_user_data
         import json
-        import os
-        from django.core.files.base import ContentFile
 
-        User = get_user_model()
         user = User.objects.get(id=user_id)
 
-        # Export user data
-        user_data = export_user_data(user)
+        # Re-send the link to a recent export instead of generating it again
+        export = cache.get(file_key)
+        file_path = os.path.join(_exports_dir(), export['filename']) if export else None
 
-        # Convert to JSON
-        json_data = json.dumps(user_data, indent=2, default=str)
+        if not file_path or not os.path.exists(file_path):
+            # Export user data
+            user_data = export_user_data(user)
 
-        # Save to file (in production, save to cloud storage)
-        filename = f"user_data_export_{user.id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.json"
-        file_path = os.path.join(settings.MEDIA_ROOT, 'exports', filename)
+            # Save to file (in production, save to cloud storage)
+            now = timezone.now()
+            filename = f"user_data_export_{user.id}_{now.strftime('%Y%m%d_%H%M%S')}.json"
+            file_path = os.path.join(_exports_dir(), filename)
 
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            # Stream the JSON into the file rather than building the whole document as one string first
+            with open(file_path, 'w', encoding='utf-8', buffering=EXPORT_WRITE_BUFFER_SIZE) as f:
+                json.dump(user_data, f, indent=2, default=str)
 
-        with open(file_path, 'w') as f:
-            f.write(json_data)
+            export = {
+                'filename': filename,
+                'expires_at': (now + timedelta(days=7)).isoformat()
+            }
+            cache.set(file_key, export, EXPORT_REUSE_SECONDS)
 
         # Send email with download link
         context = {
-            'user': user,
-            'download_url': f"{settings.FRONTEND_ADDRESS}/media/exports/{filename}",
-            'expires_at': timezone.now() + timedelta(days=7)
+            'download_url': f"{SITE_URL}/media/exports/{export['filename']}",
+            'expires_at': export['expires_at']
         }
 
         send_user_notification_email.delay(
             user.id,
             'data_export_ready',
             context,
-            'Your data export is ready'
+            'Your data export is ready',
+            user_payload=_user_payload(user)
         )
 
         logger.info(f"User data export completed for user {user.email}")
@@ -268,79 +562,106 @@ def process_user_data_export(user_id):
         logger.error(f"Failed to process data export: {str(exc)}")
         raise exc
 
+    finally:
+        cache.delete(lock_key)
+
+
+def _queue_digests(users, template_name, subject, queued=0):
+    """
+    Queue a digest email for each user with digest_notifications, one group per chunk
+
+    Countdowns continue from the digests queued before, so the mail workers get
+    a steady stream instead of a burst per chunk. Returns the running total.
+    """
+    digests = []
+    for user in users.iterator(chunk_size=DIGEST_CHUNK_SIZE):
+        notifications = user.digest_notifications
+
+        if notifications:
+            # Only JSON-safe values; the user goes in as user_payload
+            context = {
+                'notifications': [_digest_entry(notification) for notification in notifications],
+                'notification_count': len(notifications),
+                'dashboard_url': f"{SITE_URL}/dashboard"
+            }
+
+            digests.append(send_user_notification_email.s(
+                user.id,
+                template_name,
+                context,
+                subject,
+                user_payload=_user_payload(user)
+            ))
+
+        # Publish as we go so memory stays bounded by one chunk
+        if len(digests) == DIGEST_CHUNK_SIZE:
+            queued = _publish_digests(digests, queued)
+            digests = []
+
+    return _publish_digests(digests, queued)
+
+
+def _publish_digests(digests, queued):
+    """Publish a group of digests, staggered after the ones already queued"""
+    if digests:
+        group(digests).skew(
+            start=queued * DIGEST_DISPATCH_STEP,
+            step=DIGEST_DISPATCH_STEP
+        ).apply_async()
+    return queued + len(digests)
+
 
 @shared_task
 def send_digest_emails():
     """
     Send daily/weekly digest emails to users
     """
-    from django.contrib.auth import get_user_model
-    from .models import UserPreference, UserNotification
+    from django.db.models import Prefetch
+    from .models import UserNotification
 
     try:
-        User = get_user_model()
+        now = timezone.now()
 
-        # Get users who want daily digests
+        # Get users who want daily digests, with their unread notifications
+        # from the last 24 hours loaded in one extra query for all of them
+        yesterday = now - timedelta(days=1)
         daily_users = User.objects.filter(
             preferences__notification_frequency='daily',
             email_notifications=True,
             is_active=True
-        ).select_related('preferences')
-
-        for user in daily_users:
-            # Get unread notifications from last 24 hours
-            yesterday = timezone.now() - timedelta(days=1)
-            notifications = user.notifications.filter(
-                created_at__gte=yesterday,
-                is_read=False
-            )[:10]  # Limit to 10 notifications
-
-            if notifications.exists():
-                context = {
-                    'user': user,
-                    'notifications': notifications,
-                    'notification_count': notifications.count(),
-                    'dashboard_url': f"{settings.FRONTEND_ADDRESS}/dashboard"
-                }
-
-                send_user_notification_email.delay(
-                    user.id,
-                    'daily_digest',
-                    context,
-                    'Daily Activity Digest'
-                )
+        ).only(*DIGEST_USER_FIELDS).prefetch_related(
+            Prefetch(
+                'notifications',
+                queryset=UserNotification.objects.filter(
+                    created_at__gte=yesterday,
+                    is_read=False
+                ).order_by('-created_at')[:10],  # Limit to 10 notifications
+                to_attr='digest_notifications'
+            )
+        )
+
+        queued = _queue_digests(daily_users, 'daily_digest', 'Daily Activity Digest')
 
         # Similar logic for weekly digests
-        if timezone.now().weekday() == 0:  # Monday
+        if now.weekday() == 0:  # Monday
+            last_week = now - timedelta(days=7)
             weekly_users = User.objects.filter(
                 preferences__notification_frequency='weekly',
                 email_notifications=True,
                 is_active=True
-            ).select_related('preferences')
-
-            for user in weekly_users:
-                last_week = timezone.now() - timedelta(days=7)
-                notifications = user.notifications.filter(
-                    created_at__gte=last_week
-                )[:20]
-
-                if notifications.exists():
-                    context = {
-                        'user': user,
-                        'notifications': notifications,
-                        'notification_count': notifications.count(),
-                        'dashboard_url': f"{settings.FRONTEND_ADDRESS}/dashboard"
-                    }
-
-                    send_user_notification_email.delay(
-                        user.id,
-                        'weekly_digest',
-                        context,
-                        'Weekly Activity Summary'
-                    )
+            ).only(*DIGEST_USER_FIELDS).prefetch_related(
+                Prefetch(
+                    'notifications',
+                    queryset=UserNotification.objects.filter(
+                        created_at__gte=last_week
+                    ).order_by('-created_at')[:20],
+                    to_attr='digest_notifications'
+                )
+            )
+            queued = _queue_digests(weekly_users, 'weekly_digest', 'Weekly Activity Summary', queued)
 
-        logger.info("Digest emails processed successfully")
-        return "Digest emails sent"
+        logger.info(f"Digest emails processed successfully ({queued} queued)")
+        return f"Digest emails sent to {queued} users"
 
     except Exception as exc:
         logger.error(f"Failed to send digest emails: {str(exc)}")
@@ -353,22 +674,16 @@ def update_user_statistics():
     Update user statistics and activity summaries
     """
     try:
-        from django.contrib.auth import get_user_model
         from .models import UserActivity
-        from django.db.models import Count
 
-        User = get_user_model()
-
-        # Update activity counts for users
-        users_with_activity = User.objects.filter(
-            activities__created_at__gte=timezone.now() - timedelta(days=30)
-        ).annotate(
-            recent_activity_count=Count('activities')
-        )
+        # Count distinct active users straight from user_activities; nothing
+        # reads per-user counts, so there is no annotated join to wrap
+        total_users = UserActivity.objects.filter(
+            created_at__gte=timezone.now() - timedelta(days=30)
+        ).values('user_id').distinct().count()
 
         # You can store these statistics in cache or a separate model
         # For now, just log the information
-        total_users = users_with_activity.count()
 
         logger.info(f"Updated statistics for {total_users} users")
         return f"Updated statistics for {total_users} users"
@@ -378,54 +693,49 @@ def update_user_statistics():
         raise exc
 
 
-@shared_task(bind=True, max_retries=3)
-def process_bulk_user_action(self, action_type, user_ids, action_data):
+@shared_task(**RETRY_POLICY)
+def process_bulk_user_action(action_type, user_ids, action_data):
     """
     Process bulk actions on users
     """
-    try:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-
-        users = User.objects.filter(id__in=user_ids)
-        processed_count = 0
-
-        if action_type == 'send_notification':
-            from .models import UserNotification
-
-            for user in users:
-                UserNotification.create_notification(
-                    user=user,
-                    title=action_data['title'],
-                    message=action_data['message'],
-                    notification_type=action_data.get('type', 'info')
-                )
-                processed_count += 1
-
-        elif action_type == 'send_email':
-            for user in users:
-                send_user_notification_email.delay(
-                    user.id,
+    users = User.objects.filter(id__in=user_ids)
+    processed_count = 0
+
+    if action_type == 'send_notification':
+        from .models import UserNotification
+
+        # Only the IDs are needed to build the rows
+        notifications = UserNotification.create_notifications_bulk(
+            users=users.values_list('id', flat=True),
+            title=action_data['title'],
+            message=action_data['message'],
+            notification_type=action_data.get('type', 'info')
+        )
+        processed_count = len(notifications)
+
+    elif action_type == 'send_email':
+        # One task and one mail connection per chunk of recipients, so a
+        # failure only retries that chunk's unsent recipients
+        recipient_ids = list(users.values_list('id', flat=True))
+        if recipient_ids:
+            group(
+                send_bulk_notification_emails.s(
+                    recipient_ids[start:start + BULK_EMAIL_CHUNK_SIZE],
                     action_data['template'],
                     action_data.get('context', {}),
                     action_data['subject']
                 )
-                processed_count += 1
+                for start in range(0, len(recipient_ids), BULK_EMAIL_CHUNK_SIZE)
+            ).apply_async()
+        processed_count = len(recipient_ids)
 
-        elif action_type == 'update_preferences':
-            from .models import UserPreference
+    elif action_type == 'update_preferences':
+        from .utils import bulk_update_user_preferences
 
-            for user in users:
-                preferences, _ = UserPreference.objects.get_or_create(user=user)
-                for key, value in action_data.items():
-                    if hasattr(preferences, key):
-                        setattr(preferences, key, value)
-                preferences.save()
-                processed_count += 1
-
-        logger.info(f"Processed bulk action {action_type} for {processed_count} users")
-        return f"Processed {action_type} for {processed_count} users"
+        processed_count = bulk_update_user_preferences(
+            users.values_list('id', flat=True),
+            action_data
+        )
 
-    except Exception as exc:
-        logger.error(f"Failed to process bulk action: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
\ No newline at end of file
+    logger.info(f"Processed bulk action {action_type} for {processed_count} users")
+    return f"Processed {action_type} for {processed_count} users"
\ No newline at end of file
@@ -1,43 +1,64 @@
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.core.mail import send_mail
-from django.template.loader import render_to_string
 from django.conf import settings
-from typing import Optional, List, Dict, Any
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
+from typing import Optional, Dict, Any
 import hashlib
+import json
 import secrets
-import string
 from datetime import timedelta
 
-from .models import UserActivity, UserNotification, UserSession
+from .models import UserActivity, UserAgent, UserNotification, UserSession
 
 User = get_user_model()
 
+# Cache key and lifetime of the recent-password-change check in get_user_security_score
+SECURITY_SCORE_PASSWORD_KEY = 'sec_score:pwd:{user_id}'
+SECURITY_SCORE_CACHE_SECONDS = 5 * 60
+
+# Permission (see _role_permissions) required by each organization action in validate_user_action
+ACTION_PERMISSIONS = {
+    'invite_user': 'can_invite_users',
+    'manage_api_keys': 'can_manage_api_keys',
+    'view_analytics': 'can_view_analytics',
+    'manage_billing': 'can_manage_billing',
+}
+
 
 def generate_secure_token(length: int = 32) -> str:
     """
-    Generate a cryptographically secure random token
+    Generate a cryptographically secure random token of URL-safe characters
     """
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(length))
+    # One urandom read, base64-encoded in C; 6 bits of entropy per character
+    return secrets.token_urlsafe(length)[:length]
 
 
-def hash_user_data(data: str) -> str:
+def hash_user_data(data: str | bytes) -> str:
     """
     Hash sensitive user data for storage/comparison
     """
-    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+    # Callers that already hold bytes skip the encode
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
 
 
 def get_client_ip(request) -> str:
     """
-    Extract client IP address from request
+    Extract client IP address from request, parsed once and memoized on the request
     """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
+    ip = getattr(request, '_client_ip', None)
+    if ip is None:
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip = x_forwarded_for.split(',', 1)[0].strip()
+        else:
+            ip = request.META.get('REMOTE_ADDR', '0.0.0.0')
+        request._client_ip = ip
     return ip
 
 
@@ -58,9 +79,9 @@ def log_user_activity(
         action=action,
         description=description,
         ip_address=ip_address,
-        user_agent=user_agent,
+        user_agent_id=UserAgent.intern(user_agent),
         organization=organization,
-        metadata=metadata or {}
+        metadata=metadata or None
     )
 
 
@@ -85,7 +106,7 @@ def create_user_notification(
         organization=organization,
         action_url=action_url,
         action_text=action_text,
-        metadata=metadata or {}
+        metadata=metadata or None
     )
 
 
@@ -99,6 +120,8 @@ def send_user_email(
     """
     Send email to user with template rendering
     """
+    from .tasks import _render_email
+
     try:
         context = context or {}
         context.update({
@@ -107,9 +130,8 @@ def send_user_email(
             'site_url': getattr(settings, 'FRONTEND_ADDRESS', 'http://localhost:3000')
         })
 
-        # Render email templates
-        html_message = render_to_string(f'users/emails/{template_name}.html', context)
-        text_message = render_to_string(f'users/emails/{template_name}.txt', context)
+        # Render with the per-process compiled templates shared with the email tasks
+        text_message, html_message = _render_email(template_name, context)
 
         send_mail(
             subject=subject,
@@ -133,28 +155,32 @@ def cleanup_user_data(user: User, keep_days: int = 90) -> Dict[str, int]:
     """
     Clean up old user data (activities, notifications, sessions)
     """
+    from .tasks import _raw_delete_in_batches
+
     cutoff_date = timezone.now() - timedelta(days=keep_days)
 
     # Clean up old activities
-    old_activities = user.activities.filter(created_at__lt=cutoff_date)
-    activities_count = old_activities.count()
-    old_activities.delete()
+    # Nothing references these rows and read notifications don't affect the
+    # unread counter, so they can skip the delete collector
+    activities_count = _raw_delete_in_batches(
+        user.activities.filter(created_at__lt=cutoff_date)
+    )
 
     # Clean up old read notifications
-    old_notifications = user.notifications.filter(
-        created_at__lt=cutoff_date,
-        is_read=True
+    notifications_count = _raw_delete_in_batches(
+        user.notifications.filter(
+            created_at__lt=cutoff_date,
+            is_read=True
+        )
     )
-    notifications_count = old_notifications.count()
-    old_notifications.delete()
 
     # Clean up old inactive sessions
-    old_sessions = user.sessions.filter(
-        created_at__lt=cutoff_date,
-        is_active=False
+    sessions_count = _raw_delete_in_batches(
+        user.sessions.filter(
+            created_at__lt=cutoff_date,
+            is_active=False
+        )
     )
-    sessions_count = old_sessions.count()
-    old_sessions.delete()
 
     return {
         'activities_deleted': activities_count,
@@ -167,9 +193,25 @@ def get_user_statistics(user: User) -> Dict[str, Any]:
     """
     Get comprehensive user statistics
     """
-    today = timezone.now().date()
-    week_ago = timezone.now() - timedelta(days=7)
-    month_ago = timezone.now() - timedelta(days=30)
+    now = timezone.now()
+    today = now.date()
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+
+    # One conditional aggregate per table instead of a COUNT per statistic
+    activity_stats = user.activities.aggregate(
+        total=Count('id'),
+        this_week=Count('id', filter=Q(created_at__gte=week_ago)),
+        this_month=Count('id', filter=Q(created_at__gte=month_ago)),
+    )
+    notification_stats = user.notifications.aggregate(
+        total=Count('id'),
+        this_week=Count('id', filter=Q(created_at__gte=week_ago)),
+    )
+    session_stats = user.sessions.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True, expires_at__gt=now)),
+    )
 
     return {
         # Basic stats
@@ -178,21 +220,18 @@ def get_user_statistics(user: User) -> Dict[str, Any]:
         'account_age_days': (today - user.date_joined.date()).days,
 
         # Activity stats
-        'total_activities': user.activities.count(),
-        'activities_this_week': user.activities.filter(created_at__gte=week_ago).count(),
-        'activities_this_month': user.activities.filter(created_at__gte=month_ago).count(),
+        'total_activities': activity_stats['total'],
+        'activities_this_week': activity_stats['this_week'],
+        'activities_this_month': activity_stats['this_month'],
 
         # Notification stats
-        'total_notifications': user.notifications.count(),
-        'unread_notifications': user.notifications.filter(is_read=False).count(),
-        'notifications_this_week': user.notifications.filter(created_at__gte=week_ago).count(),
+        'total_notifications': notification_stats['total'],
+        'unread_notifications': user.unread_notifications_count,
+        'notifications_this_week': notification_stats['this_week'],
 
         # Session stats
-        'active_sessions': user.sessions.filter(
-            is_active=True,
-            expires_at__gt=timezone.now()
-        ).count(),
-        'total_sessions': user.sessions.count(),
+        'active_sessions': session_stats['active'],
+        'total_sessions': session_stats['total'],
 
         # Security stats
         'has_2fa': user.two_factor_enabled,
@@ -202,30 +241,40 @@ def get_user_statistics(user: User) -> Dict[str, Any]:
     }
 
 
+def _get_user_role(user: User, organization):
+    """
+    Get the user's role in the organization, memoized on the organization instance
+
+    Organization instances live for one request or task, so repeated
+    permission checks share one lookup without going stale across requests.
+    """
+    roles = organization.__dict__.setdefault('_user_roles', {})
+    if user.pk not in roles:
+        roles[user.pk] = organization.get_user_role(user)
+    return roles[user.pk]
+
+
+def _role_permissions(role) -> Dict[str, bool]:
+    """Organization permissions granted by a role (all False without one)"""
+    return {
+        'can_invite_users': bool(role and role.can_manage_members),
+        'can_manage_api_keys': bool(role and role.can_manage_api_keys),
+        'can_view_analytics': bool(role and role.can_view_analytics),
+        'can_manage_billing': bool(role and role.can_manage_billing),
+    }
+
+
 def check_user_permissions(user: User, organization=None) -> Dict[str, bool]:
     """
     Check user permissions in organization context
     """
-    permissions = {
+    user_role = _get_user_role(user, organization) if organization else None
+
+    return {
         'can_create_organization': True,  # All users can create
-        'can_invite_users': False,
-        'can_manage_api_keys': False,
-        'can_view_analytics': False,
-        'can_manage_billing': False,
+        **_role_permissions(user_role),
     }
 
-    if organization:
-        user_role = organization.get_user_role(user)
-        if user_role:
-            permissions.update({
-                'can_invite_users': user_role.can_manage_members,
-                'can_manage_api_keys': user_role.can_manage_api_keys,
-                'can_view_analytics': user_role.can_view_analytics,
-                'can_manage_billing': user_role.can_manage_billing,
-            })
-
-    return permissions
-
 
 def validate_user_action(user: User, action: str, **kwargs) -> tuple[bool, str]:
     """
@@ -243,18 +292,11 @@ def validate_user_action(user: User, action: str, **kwargs) -> tuple[bool, str]:
     # Organization-specific validations
     organization = kwargs.get('organization')
     if organization and action in ['invite_user', 'manage_api_keys', 'view_analytics']:
-        user_role = organization.get_user_role(user)
+        user_role = _get_user_role(user, organization)
         if not user_role:
             return False, "You are not a member of this organization"
 
-        action_permissions = {
-            'invite_user': user_role.can_manage_members,
-            'manage_api_keys': user_role.can_manage_api_keys,
-            'view_analytics': user_role.can_view_analytics,
-            'manage_billing': user_role.can_manage_billing,
-        }
-
-        if not action_permissions.get(action, False):
+        if not _role_permissions(user_role).get(ACTION_PERMISSIONS.get(action), False):
             return False, f"Insufficient permissions to {action.replace('_', ' ')}"
 
     return True, "Action allowed"
@@ -265,24 +307,24 @@ def get_user_activity_summary(user: User, days: int = 30) -> Dict[str, Any]:
     Get user activity summary for the last N days
     """
     start_date = timezone.now() - timedelta(days=days)
-    activities = user.activities.filter(created_at__gte=start_date)
+    activities = user.activities.filter(created_at__gte=start_date).order_by()
 
-    # Group activities by action type
-    activity_counts = {}
-    for activity in activities:
-        action = activity.action
-        activity_counts[action] = activity_counts.get(action, 0) + 1
+    # Group activities by action type in the database
+    activity_counts = {
+        row['action']: row['count']
+        for row in activities.values('action').annotate(count=Count('id'))
+    }
 
     # Get most active days
-    from django.db.models import Count
-    daily_activity = activities.extra(
-        select={'day': 'date(created_at)'}
+    from django.db.models.functions import TruncDate
+    daily_activity = activities.annotate(
+        day=TruncDate('created_at')
     ).values('day').annotate(
         count=Count('id')
     ).order_by('-count')[:7]
 
     return {
-        'total_activities': activities.count(),
+        'total_activities': sum(activity_counts.values()),
         'activity_by_type': activity_counts,
         'most_active_days': list(daily_activity),
         'period_days': days
@@ -291,69 +333,69 @@ def get_user_activity_summary(user: User, days: int = 30) -> Dict[str, Any]:
 
 def send_security_alert(user: User, alert_type: str, details: Dict[str, Any]) -> bool:
     """
-    Send security alert to user
-    """
-    alert_templates = {
-        'login_from_new_device': {
-            'subject': 'New device login detected',
-            'template': 'security_alert_new_device'
-        },
-        'password_changed': {
-            'subject': 'Password changed successfully',
-            'template': 'security_alert_password_change'
-        },
-        'suspicious_activity': {
-            'subject': 'Suspicious activity detected',
-            'template': 'security_alert_suspicious'
-        },
-        'api_key_created': {
-            'subject': 'New API key created',
-            'template': 'security_alert_api_key'
-        }
-    }
+    Queue a security alert email and in-app notification for the user
+
+    Both are only queued once the surrounding transaction commits.
+    """
+    from . import activity_buffer
+    from .tasks import SECURITY_ALERT_TEMPLATES, send_security_alert_email
 
-    alert_config = alert_templates.get(alert_type)
+    alert_config = SECURITY_ALERT_TEMPLATES.get(alert_type)
     if not alert_config:
         return False
 
-    # Send email
-    email_sent = send_user_email(
-        user=user,
-        subject=alert_config['subject'],
-        template_name=alert_config['template'],
-        context=details
-    )
+    user_id = user.id
+    metadata = json.loads(json.dumps(details, cls=DjangoJSONEncoder))
 
-    # Create in-app notification
-    create_user_notification(
-        user=user,
-        title=alert_config['subject'],
-        message=f"Security alert: {alert_type.replace('_', ' ')}",
-        notification_type='security',
-        metadata=details
-    )
+    def queue_alert():
+        # Render and send the email on a worker instead of in the request
+        send_security_alert_email.delay(user_id, alert_type, details)
+
+        # Create in-app notification; written in batches by flush_activity_buffer
+        activity_buffer.enqueue_notification(
+            user_id,
+            alert_config['subject'],
+            f"Security alert: {alert_type.replace('_', ' ')}",
+            notification_type='security',
+            metadata=metadata
+        )
 
-    return email_sent
+    transaction.on_commit(queue_alert)
 
+    return True
 
-def bulk_update_user_preferences(users: List[User], preferences: Dict[str, Any]) -> int:
+
+def bulk_update_user_preferences(users, preferences: Dict[str, Any]) -> int:
     """
-    Bulk update user preferences
+    Bulk update user preferences for the given users (instances or IDs)
     """
     from .models import UserPreference
 
-    updated_count = 0
-    for user in users:
-        user_pref, created = UserPreference.objects.get_or_create(user=user)
+    preference_fields = {
+        field.name for field in UserPreference._meta.concrete_fields
+        if not field.primary_key and field.name not in ('user', 'created_at', 'updated_at')
+    }
+    updates = {key: value for key, value in preferences.items() if key in preference_fields}
 
-        for key, value in preferences.items():
-            if hasattr(user_pref, key):
-                setattr(user_pref, key, value)
+    user_ids = {getattr(user, 'pk', user) for user in users}
+    existing_ids = set(
+        UserPreference.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True)
+    )
 
-        user_pref.save()
-        updated_count += 1
+    # One UPDATE for existing rows and one batched INSERT for users without preferences
+    with transaction.atomic():
+        if updates and existing_ids:
+            UserPreference.objects.filter(user_id__in=existing_ids).update(
+                **updates,
+                updated_at=timezone.now()
+            )
+        UserPreference.objects.bulk_create(
+            [UserPreference(user_id=user_id, **updates) for user_id in user_ids - existing_ids],
+            batch_size=500,
+            ignore_conflicts=True
+        )
 
-    return updated_count
+    return len(user_ids)
 
 
 def export_user_data(user: User) -> Dict[str, Any]:
@@ -391,16 +433,18 @@ def export_user_data(user: User) -> Dict[str, Any]:
     except:
         user_data['preferences'] = {}
 
-    # Activities
+    # Activities; only the exported columns, streamed rather than cached on the queryset
     user_data['activities'] = [
         {
             'action': activity.action,
             'description': activity.description,
             'created_at': activity.created_at.isoformat(),
             'ip_address': activity.ip_address,
-            'metadata': activity.metadata
+            'metadata': activity.metadata or {}
         }
-        for activity in user.activities.all()[:1000]  # Limit to last 1000
+        for activity in user.activities.only(
+            'action', 'description', 'created_at', 'ip_address', 'metadata'
+        ).order_by('-created_at')[:1000].iterator(chunk_size=200)  # Limit to last 1000
     ]
 
     # Notifications
@@ -412,7 +456,9 @@ def export_user_data(user: User) -> Dict[str, Any]:
             'is_read': notif.is_read,
             'created_at': notif.created_at.isoformat(),
         }
-        for notif in user.notifications.all()[:500]  # Limit to last 500
+        for notif in user.notifications.only(
+            'title', 'message', 'notification_type', 'is_read', 'created_at'
+        ).order_by('-created_at')[:500].iterator(chunk_size=200)  # Limit to last 500
     ]
 
     # Organization memberships
@@ -423,7 +469,9 @@ def export_user_data(user: User) -> Dict[str, Any]:
             'joined_at': membership.joined_at.isoformat(),
             'is_active': membership.is_active,
         }
-        for membership in user.organization_memberships.all()
+        for membership in user.organization_memberships.select_related(
+            'organization', 'role'
+        ).only('joined_at', 'is_active', 'organization__name', 'role__name')
     ]
 
     return user_data
@@ -436,34 +484,50 @@ def anonymize_user_data(user: User) -> bool:
     try:
         # Generate anonymous identifiers
         anonymous_id = f"anon_{generate_secure_token(8)}"
+        email = f"{anonymous_id}@deleted.local"
+
+        anonymized = {
+            'username': anonymous_id,
+            'email': email,
+            'gravatar_hash': User.compute_gravatar_hash(email),
+            'first_name': "Deleted",
+            'last_name': "User",
+            'phone': "",
+            'bio': "",
+            'location': "",
+            'website': "",
+            'avatar': "",
+            'is_active': False,
+            'unread_notifications_count': 0,
+        }
 
-        # Anonymize personal data
-        user.username = anonymous_id
-        user.email = f"{anonymous_id}@deleted.local"
-        user.first_name = "Deleted"
-        user.last_name = "User"
-        user.phone = ""
-        user.bio = ""
-        user.location = ""
-        user.website = ""
-        user.is_active = False
-
-        # Clear avatar
+        # All or nothing; the notification and session rows can skip the delete
+        # collector because nothing references them
+        with transaction.atomic():
+            # Anonymize personal data in one UPDATE
+            User.objects.filter(pk=user.pk).update(**anonymized)
+
+            # Anonymize activities (keep structure but remove sensitive data)
+            user.activities.update(
+                ip_address=None,
+                user_agent=None,
+                metadata=None
+            )
+
+            # Delete notifications and sessions
+            notifications = user.notifications.all()
+            notifications._raw_delete(notifications.db)
+            sessions = user.sessions.all()
+            sessions._raw_delete(sessions.db)
+
+        # Clear avatar file once the row no longer points at it
         if user.avatar:
-            user.avatar.delete()
-
-        user.save()
+            user.avatar.delete(save=False)
 
-        # Anonymize activities (keep structure but remove sensitive data)
-        user.activities.update(
-            ip_address=None,
-            user_agent="",
-            metadata={}
-        )
-
-        # Delete notifications and sessions
-        user.notifications.all().delete()
-        user.sessions.all().delete()
+        # Keep the caller's instance in step with the row
+        for field, value in anonymized.items():
+            setattr(user, field, value)
+        user.__dict__.pop('_full_name', None)
 
         return True
 
@@ -471,9 +535,12 @@ def anonymize_user_data(user: User) -> bool:
         return False
 
 
-def get_user_security_score(user: User) -> Dict[str, Any]:
+def get_user_security_score(user: User, active_sessions_count: Optional[int] = None) -> Dict[str, Any]:
     """
     Calculate user security score based on various factors
+
+    Pass active_sessions_count when the caller has already counted the
+    user's active sessions.
     """
     score = 0
     max_score = 100
@@ -499,11 +566,16 @@ def get_user_security_score(user: User) -> Dict[str, Any]:
     if completed_fields < len(profile_fields):
         recommendations.append("Complete your profile information")
 
-    # Recent password change (15 points)
-    recent_password_change = user.activities.filter(
-        action='password_change',
-        created_at__gte=timezone.now() - timedelta(days=90)
-    ).exists()
+    # Recent password change (15 points); cached because it searches the
+    # activity history, and cleared by a signal when the password changes
+    cache_key = SECURITY_SCORE_PASSWORD_KEY.format(user_id=user.pk)
+    recent_password_change = cache.get(cache_key)
+    if recent_password_change is None:
+        recent_password_change = user.activities.filter(
+            action='password_change',
+            created_at__gte=timezone.now() - timedelta(days=90)
+        ).order_by().exists()
+        cache.set(cache_key, recent_password_change, SECURITY_SCORE_CACHE_SECONDS)
 
     if recent_password_change:
         score += 15
@@ -511,10 +583,11 @@ def get_user_security_score(user: User) -> Dict[str, Any]:
         recommendations.append("Consider changing your password regularly")
 
     # Active session management (10 points)
-    active_sessions_count = user.sessions.filter(
-        is_active=True,
-        expires_at__gt=timezone.now()
-    ).count()
+    if active_sessions_count is None:
+        active_sessions_count = user.sessions.filter(
+            is_active=True,
+            expires_at__gt=timezone.now()
+        ).count()
 
     if active_sessions_count <= 3:  # Reasonable number of sessions
         score += 10
@@ -544,13 +617,32 @@ class UserDataManager:
 
     def get_dashboard_data(self) -> Dict[str, Any]:
         """Get data for user dashboard"""
+        prefetch_related_objects(
+            [self.user],
+            Prefetch(
+                'activities',
+                queryset=UserActivity.objects.order_by('-created_at')[:10],
+                to_attr='dashboard_activities'
+            ),
+            Prefetch(
+                'notifications',
+                queryset=UserNotification.objects.filter(is_read=False).order_by('-created_at')[:5],
+                to_attr='dashboard_notifications'
+            ),
+        )
+        statistics = get_user_statistics(self.user)
+
         return {
             'user': self.user,
-            'statistics': get_user_statistics(self.user),
-            'recent_activities': self.user.activities.all()[:10],
-            'unread_notifications': self.user.notifications.filter(is_read=False)[:5],
+            'statistics': statistics,
+            'recent_activities': self.user.dashboard_activities,
+            'unread_notifications': self.user.dashboard_notifications,
             'organizations': self.user.get_organizations(),
-            'security_score': get_user_security_score(self.user),
+            # Reuse the session count from the statistics aggregate
+            'security_score': get_user_security_score(
+                self.user,
+                active_sessions_count=statistics['active_sessions']
+            ),
         }
 
     def cleanup_old_data(self, days: int = 90) -> Dict[str, int]:
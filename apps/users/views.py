@@ -1,4 +1,5 @@
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -19,6 +20,7 @@ from drf_spectacular.utils import (
 from drf_spectacular.types import OpenApiTypes
 
 from .models import (
+    ACTIVITY_ACTION_CODES,
     UserPreference,
     UserActivity,
     UserSession,
@@ -39,6 +41,7 @@ from .serializers import (
     UserOnboardingSerializer
 )
 from .permissions import IsOwnerOrReadOnly, CanViewUserData
+from .utils import get_client_ip
 
 User = get_user_model()
 
@@ -70,6 +73,14 @@ class UserProfileViewSet(viewsets.ModelViewSet):
 
     def get_object(self):
         """Return the current user"""
+        if self.action == 'retrieve':
+            # Load everything UserDetailSerializer renders in one query plus one prefetch
+            return (
+                User.objects.with_counts()
+                .with_verification()
+                .with_recent_activities()
+                .get(pk=self.request.user.pk)
+            )
         return self.request.user
 
     def get_serializer_class(self):
@@ -94,7 +105,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             'total_organizations': user.total_organizations,
             'owned_organizations': user.owned_organizations_count,
             'total_notifications': user.notifications.count(),
-            'unread_notifications': user.notifications.filter(is_read=False).count(),
+            'unread_notifications': user.unread_notifications_count,
             'recent_activities_count': user.activities.filter(
                 created_at__gte=timezone.now() - timedelta(days=30)
             ).count(),
@@ -139,7 +150,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
                 user=user,
                 action='password_change',
                 description='Password changed successfully',
-                ip_address=self.get_client_ip(request)
+                ip_address=get_client_ip(request)
             )
 
             return Response({'message': 'Password changed successfully'})
@@ -170,15 +181,6 @@ class UserProfileViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-
 
 @extend_schema_view(
     retrieve=extend_schema(
@@ -248,6 +250,9 @@ class UserActivityViewSet(viewsets.ReadOnlyModelViewSet):
         # Filter by action type
         action = self.request.query_params.get('action')
         if action:
+            # Unknown actions have no stored code, so they can never match
+            if action not in ACTIVITY_ACTION_CODES:
+                return queryset.none()
             queryset = queryset.filter(action=action)
 
         # Filter by days
@@ -292,7 +297,7 @@ class UserSessionViewSet(viewsets.ModelViewSet):
         return self.request.user.sessions.filter(
             is_active=True,
             expires_at__gt=timezone.now()
-        ).order_by('-last_activity')
+        ).select_related('user_agent').order_by('-last_activity')
 
     def destroy(self, request, *args, **kwargs):
         """Terminate a session"""
@@ -417,6 +422,15 @@ class UserNotificationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    def perform_update(self, serializer):
+        """Save the notification and keep the user's unread counter in step"""
+        was_read = serializer.instance.is_read
+        notification = serializer.save()
+        if notification.is_read != was_read:
+            UserNotification.adjust_unread_count(
+                [notification.user_id], -1 if notification.is_read else 1
+            )
+
     @extend_schema(
         summary="Mark notification as read",
         description="Mark a specific notification as read.",
@@ -439,9 +453,7 @@ class UserNotificationViewSet(viewsets.ModelViewSet):
     def mark_unread(self, request, pk=None):
         """Mark notification as unread"""
         notification = self.get_object()
-        notification.is_read = False
-        notification.read_at = None
-        notification.save(update_fields=['is_read', 'read_at'])
+        notification.mark_as_unread()
 
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
@@ -454,12 +466,7 @@ class UserNotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        updated_count = self.request.user.notifications.filter(
-            is_read=False
-        ).update(
-            is_read=True,
-            read_at=timezone.now()
-        )
+        updated_count = UserNotification.mark_all_as_read(request.user)
 
         return Response({
             'message': f'Marked {updated_count} notifications as read'
@@ -485,23 +492,29 @@ class UserNotificationViewSet(viewsets.ModelViewSet):
 
             notifications = request.user.notifications.filter(id__in=notification_ids)
 
-            if action == 'mark_read':
-                notifications.update(
-                    is_read=True,
-                    read_at=timezone.now()
-                )
-                message = f'Marked {len(notification_ids)} notifications as read'
-
-            elif action == 'mark_unread':
-                notifications.update(
-                    is_read=False,
-                    read_at=None
-                )
-                message = f'Marked {len(notification_ids)} notifications as unread'
-
-            elif action == 'delete':
-                notifications.delete()
-                message = f'Deleted {len(notification_ids)} notifications'
+            with transaction.atomic():
+                if action == 'mark_read':
+                    # Leave already-read rows (and their read_at) untouched
+                    updated_count = notifications.filter(is_read=False).update(
+                        is_read=True,
+                        read_at=timezone.now()
+                    )
+                    UserNotification.adjust_unread_count([request.user.pk], -updated_count)
+                    message = f'Marked {updated_count} notifications as read'
+
+                elif action == 'mark_unread':
+                    updated_count = notifications.filter(is_read=True).update(
+                        is_read=False,
+                        read_at=None
+                    )
+                    UserNotification.adjust_unread_count([request.user.pk], updated_count)
+                    message = f'Marked {updated_count} notifications as unread'
+
+                elif action == 'delete':
+                    # UserNotificationQuerySet.delete() keeps the unread counter in step
+                    _, deleted_per_model = notifications.delete()
+                    deleted_count = deleted_per_model.get(UserNotification._meta.label, 0)
+                    message = f'Deleted {deleted_count} notifications'
 
             return Response({'message': message})
 
@@ -616,19 +629,10 @@ class DeleteAccountView(APIView):
             user=user,
             action='account_delete',
             description='User account deleted',
-            ip_address=self.get_client_ip(request)
+            ip_address=get_client_ip(request)
         )
 
         # Delete user account
         user.delete()
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
-
-    def get_client_ip(self, request):
-        """Get client IP address"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
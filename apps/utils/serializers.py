@@ -0,0 +1,23 @@
+import copy
+
+from rest_framework import serializers
+
+# Unbound field instances built once per serializer class
+_FIELD_CACHE = {}
+
+
+class CachedModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that introspects Meta and deep-copies declared fields once per class
+
+    Each instance gets shallow copies of the cached fields, which is enough
+    because binding only sets attributes on the field itself. Don't use this
+    for serializers whose fields depend on the instance, context or request.
+    """
+
+    def get_fields(self):
+        cls = self.__class__
+        cached = _FIELD_CACHE.get(cls)
+        if cached is None:
+            cached = _FIELD_CACHE[cls] = super().get_fields()
+        return {name: copy.copy(field) for name, field in cached.items()}
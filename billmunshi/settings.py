@@ -283,13 +283,22 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# SMTP-bound tasks get their own queue so slow sends don't hold up
+# cleanup and statistics tasks on the default queue
+CELERY_TASK_ROUTES = {
+    'apps.users.tasks.send_email_async': {'queue': 'mail'},
+    'apps.users.tasks.send_user_notification_email': {'queue': 'mail'},
+    'apps.users.tasks.send_bulk_notification_emails': {'queue': 'mail'},
+    'apps.users.tasks.send_security_alert_email': {'queue': 'mail'},
+}
+
 # Celery Beat Schedule
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
     'cleanup-expired-sessions': {
         'task': 'apps.users.tasks.cleanup_expired_sessions',
-        'schedule': crontab(hour=2, minute=0),  # Daily at 2 AM
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
     },
     'process-subscription-renewals': {
         'task': 'apps.subscriptions.tasks.check_subscription_renewals',
@@ -303,9 +312,13 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.subscriptions.tasks.generate_monthly_reports',
         'schedule': crontab(day_of_month=1, hour=3, minute=0),  # First day of month at 3 AM
     },
+    'flush-activity-buffer': {
+        'task': 'apps.users.tasks.flush_activity_buffer',
+        'schedule': 2.0,  # Every 2 seconds
+    },
     'cleanup-old-activities': {
         'task': 'apps.users.tasks.cleanup_old_activities',
-        'schedule': crontab(day_of_week=0, hour=3, minute=30),  # Weekly on Sunday at 3:30 AM
+        'schedule': crontab(hour=3, minute=30),  # Daily at 3:30 AM
     },
     'send-digest-emails': {
         'task': 'apps.users.tasks.send_digest_emails',